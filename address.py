@@ -1,4 +1,6 @@
 class Address:
+    __slots__ = ('ID', 'name', 'street', 'city', 'state', 'zip')
+
     def __init__(self, ID, name, street):
         self.ID = int(ID)
         self.name = name
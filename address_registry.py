@@ -0,0 +1,48 @@
+import re
+
+from address import Address
+
+# Street type words, a unit designator followed by one of these is part of the street name, e.g. "100 Unit St"
+_STREET_TYPES = ('st|street|rd|road|ave|av|avenue|blvd|boulevard|dr|drive|ln|lane|way|ct|court|pl|place|pkwy|parkway|'
+                 'cir|circle|hwy|highway|ter|terrace|trl|trail|sq|square|loop|row|pike|plz|plaza')
+
+# Trailing unit designators, e.g. "#104", "Apt 3", "Suite 200", "Unit B"
+# Only stripped when a unit token follows the designator, so streets like "5 Suite Rd" keep their name
+_UNIT_SUFFIX = re.compile(r'\s*(#\s*|\b(apt|apartment|suite|ste|unit|bldg|building|fl|floor|rm|room)\b\s*#?\s*)'
+                          rf'(?!(?:{_STREET_TYPES})$)[\w-]+$')
+
+
+# Normalize a street so different spellings of the same address hash the same
+# "5383 South 900 East #104" -> "5383 south 900 east"
+def normalize_street(street: str) -> str:
+    street = street.lower().replace('.', ' ').replace(',', ' ')
+    street = ' '.join(street.split())
+    return _UNIT_SUFFIX.sub('', street)
+
+
+# Addresses by ID with a normalized street hash index
+# Lookups by street are O(1) and always return the shared Address instance
+class AddressRegistry:
+    def __init__(self, addresses=()) -> None:
+        self.by_id: dict[int, Address] = {}
+        self.by_street: dict[str, Address] = {}
+        for address in addresses:
+            self.add(address)
+
+    # the first address registered under a normalized street wins, matching a front to back scan
+    def add(self, address: Address) -> None:
+        self.by_id[address.ID] = address
+        self.by_street.setdefault(normalize_street(address.street), address)
+
+    def __getitem__(self, ID: int) -> Address:
+        return self.by_id[ID]
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def __iter__(self):
+        return iter(self.by_id.values())
+
+    def find(self, street: str) -> Address | None:
+        return self.by_street.get(normalize_street(street))
+
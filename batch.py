@@ -0,0 +1,135 @@
+import argparse
+import datetime
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from dataset import DataLoader
+from deadlines import deadline_violations
+from distance_matrix import PackedDistanceMatrix
+from main import note_truck_assigner, run_simulation, truck_assigner
+from planner import fleet_distance
+from time_utils import travel_time
+
+DEFAULT_OUTPUT = 'batch_results.jsonl'
+
+# How package truck restrictions are read, day manifests other than WGUPS's only have their notes to go on
+ASSIGNERS = {'notes': note_truck_assigner, 'wgups': truck_assigner}
+DEFAULT_ASSIGNER = 'notes'
+
+# Distance table shared by every day a worker runs, memory mapped once when the worker starts
+_worker_distances = None
+
+
+def _init_worker(packed_distances_path) -> None:
+    global _worker_distances
+    _worker_distances = PackedDistanceMatrix.open(packed_distances_path)
+
+
+# Package manifests in directory, one CSV per day in packages.csv format, ordered by file name
+def day_manifests(directory) -> list[str]:
+    names = sorted(name for name in os.listdir(directory) if name.endswith('.csv'))
+    return [os.path.join(directory, name) for name in names]
+
+
+# H:MM:SS, the float32 shared distances leave sub-second noise in travel times
+def clock(time_of_day) -> str:
+    return str(datetime.timedelta(seconds=round(time_of_day.total_seconds())))
+
+
+# Plan one day against the worker's shared distance table and summarize the result
+def run_day(packages_path, addresses_path, seed, assigner=DEFAULT_ASSIGNER) -> dict:
+    day = os.path.splitext(os.path.basename(packages_path))[0]
+    start = time.perf_counter()
+    try:
+        dataset = DataLoader(addresses_path, packages_path, distances=_worker_distances).load()
+        trucks = run_simulation(dataset, seed=seed, assigner=ASSIGNERS[assigner])
+    except (OSError, ValueError, KeyError, IndexError) as error:
+        return {'day': day, 'error': f'{type(error).__name__}: {error}'}
+
+    return {
+        'day': day,
+        'packages': len(dataset.package_ids),
+        'miles': round(fleet_distance(trucks), 1),
+        'late_packages': [violation.package_id for violation in deadline_violations(trucks)],
+        'trucks': [{'truck': truck.ID,
+                    'leave_time': clock(truck.leave_time),
+                    'finish_time': clock(truck.leave_time + travel_time(truck.total_distance)),
+                    'miles': round(truck.total_distance, 1)} for truck in trucks],
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+
+
+# Totals over every finished day, days that failed are only counted
+def aggregate(results) -> dict:
+    done = [result for result in results if 'error' not in result]
+    miles = [result['miles'] for result in done]
+    finishes = [truck['finish_time'] for result in done for truck in result['trucks']]
+    return {
+        'days': len(done),
+        'failed_days': sorted(result['day'] for result in results if 'error' in result),
+        'total_miles': round(sum(miles), 1),
+        'mean_miles': round(sum(miles) / len(miles), 1) if miles else None,
+        'max_miles': max(miles, default=None),
+        'late_packages': sum(len(result['late_packages']) for result in done),
+        'days_with_late_packages': sum(1 for result in done if result['late_packages']),
+        # H:MM:SS strings of one width sort as times
+        'latest_finish_time': max(finishes, key=lambda finish: (len(finish), finish), default=None),
+    }
+
+
+# Run every day manifest in days_directory across a process pool
+# Each day's result is written to output as one JSON line as soon as it finishes, the aggregate is the last line
+# distances.csv is packed once into a memory mapped file that every worker shares through the page cache
+def run_batch(days_directory, addresses_path='csv/addresses.csv', distances_path='csv/distances.csv',
+              output=DEFAULT_OUTPUT, workers=None, seed=0, packed_distances_path=None,
+              assigner=DEFAULT_ASSIGNER) -> dict:
+    manifests = day_manifests(days_directory)
+    with tempfile.TemporaryDirectory() as directory:
+        if packed_distances_path is None:
+            packed_distances_path = os.path.join(directory, 'distances.bin')
+        # packs the CSV, or reuses a packed file that is newer than it
+        DataLoader(distances_path=distances_path, packed_distances_path=packed_distances_path).distances()
+
+        results = []
+        with open(output, 'w') as output_file, ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker, initargs=(packed_distances_path,)) as executor:
+            futures = [executor.submit(run_day, path, addresses_path, seed, assigner) for path in manifests]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                output_file.write(json.dumps(result) + '\n')
+                output_file.flush()
+                if 'error' in result:
+                    print(f'{result["day"]}: {result["error"]}')
+                else:
+                    print(f'{result["day"]}: {result["miles"]} miles, {len(result["late_packages"])} late')
+
+            summary = aggregate(results)
+            output_file.write(json.dumps({'summary': summary}) + '\n')
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Plan a directory of WGUPS day manifests in parallel.')
+    parser.add_argument('days', help='directory of package CSVs, one per day')
+    parser.add_argument('--addresses', default='csv/addresses.csv', help='addresses shared by every day')
+    parser.add_argument('--distances', default='csv/distances.csv', help='distance table shared by every day')
+    parser.add_argument('--packed-distances', help='packed distance file to build or reuse, temporary if omitted')
+    parser.add_argument('--workers', type=int, help='worker processes, every CPU if omitted')
+    parser.add_argument('--seed', type=int, default=0, help='seed used to plan every day')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='JSON lines results file')
+    parser.add_argument('--assigner', choices=ASSIGNERS, default=DEFAULT_ASSIGNER,
+                        help='read truck restrictions from package notes, or from the WGUPS package IDs')
+    args = parser.parse_args()
+
+    summary = run_batch(args.days, args.addresses, args.distances, args.output, args.workers, args.seed,
+                        args.packed_distances, args.assigner)
+    print(json.dumps(summary, indent=2))
+    print(f'Results written to {os.path.abspath(args.output)}')
+
+
+if __name__ == '__main__':
+    main()
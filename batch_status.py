@@ -0,0 +1,58 @@
+import datetime
+
+import numpy as np
+
+from status import Status
+
+# Status matrix cell values, STATUS_CODES[code] is the Status
+STATUS_CODES = (Status.AT_HUB, Status.DELAYED, Status.OUT_FOR_DELIVERY, Status.DELIVERED, Status.CANCELLED)
+AT_HUB, DELAYED, OUT_FOR_DELIVERY, DELIVERED, CANCELLED = range(len(STATUS_CODES))
+
+
+# Seconds since midnight for timedeltas, numpy timedelta64 values or plain seconds
+def as_seconds(times) -> np.ndarray:
+    times = np.asarray(times)
+    if np.issubdtype(times.dtype, np.timedelta64):
+        return times / np.timedelta64(1, 's')
+    if times.dtype == object:
+        return np.array([time.total_seconds() for time in times.ravel()], dtype=np.float64).reshape(times.shape)
+    return times.astype(np.float64)
+
+
+# Evenly spaced times from start to end inclusive, in seconds
+def day_ticks(start=datetime.timedelta(hours=8), end=datetime.timedelta(hours=18),
+              step=datetime.timedelta(minutes=5)) -> np.ndarray:
+    return np.arange(start.total_seconds(), end.total_seconds() + 1, step.total_seconds())
+
+
+# Status of every package in ids at every time in times as a (packages, times) matrix of STATUS_CODES indexes
+# Whole columns are compared at once against the store's leave, delivery and hub arrival times,
+# following the same transitions as PackageTimeline
+def status_matrix(store, ids, times) -> np.ndarray:
+    ids = np.asarray(ids, dtype=np.int64)
+    rows = np.searchsorted(store.ids, ids)
+    found = rows < len(store.ids)
+    found[found] = store.ids[rows[found]] == ids[found]
+    if not found.all():
+        raise KeyError(f'Unknown package IDs: {ids[~found].tolist()}')
+
+    time = as_seconds(times)[np.newaxis, :]
+    leave = store.leave_time[rows][:, np.newaxis]
+    delivery = store.delivery_time[rows][:, np.newaxis]
+    # a delayed package loaded before its stated arrival counts as arrived when its truck left
+    # fmin skips an unset leave time, an unset arrival stays NaN
+    arrival = store.hub_arrival[rows]
+    delayed_until = np.where(np.isnan(arrival), np.nan, np.fmin(arrival, store.leave_time[rows]))[:, np.newaxis]
+
+    # NaN times compare False, so unset leave or delivery times never trigger a transition
+    matrix = np.full((len(ids), time.shape[1]), AT_HUB, dtype=np.int8)
+    matrix[time < delayed_until] = DELAYED
+    matrix[time >= leave] = OUT_FOR_DELIVERY
+    matrix[(time >= delivery) & (time >= leave)] = DELIVERED
+    matrix[time >= store.cancel_time[rows][:, np.newaxis]] = CANCELLED
+    return matrix
+
+
+# Number of packages in each status at each time, {Status: counts per column of the matrix}
+def status_counts(matrix) -> dict[Status, np.ndarray]:
+    return {status: np.count_nonzero(matrix == code, axis=0) for code, status in enumerate(STATUS_CODES)}
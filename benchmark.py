@@ -0,0 +1,177 @@
+import argparse
+import copy
+import datetime
+import json
+import os
+import platform
+import random
+import resource
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from candidates import CandidateLists
+from dataset import DataLoader
+from hash_table import HashTableWithChaining, HashTableWithOpenAddressing
+from main import (allowed_trucks, build_route, dispatch_trucks, improve_truck_route, load_truck, note_truck_assigner,
+                  sort_packages)
+from planner import fleet_distance
+from rebalance import rebalance_trucks
+from scenario import ScenarioGenerator
+from truck import Truck
+
+DEFAULT_SIZES = (100, 1000, 10000, 100000)
+DEFAULT_OUTPUT = 'bench_results.json'
+
+# Trucks per scenario, sort_packages loads three, so truck notes are drawn over the same three
+FLEET_SIZE = 3
+
+
+# Stops used for a package count when none is given, capped so the distance table stays manageable
+def default_stops(packages) -> int:
+    return min(max(packages // 4, 27), 2000)
+
+
+# Collects wall time, and optionally traced peak memory, for each named phase
+class PhaseRecorder:
+    def __init__(self, trace_memory=False) -> None:
+        self.trace_memory = trace_memory
+        self.phases = {}
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+
+class _Phase:
+    def __init__(self, recorder, name) -> None:
+        self.recorder = recorder
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        if self.recorder.trace_memory:
+            tracemalloc.reset_peak()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        result = {'seconds': time.perf_counter() - self.start}
+        if self.recorder.trace_memory:
+            result['peak_traced_bytes'] = tracemalloc.get_traced_memory()[1]
+        self.recorder.phases[self.name] = result
+        return False
+
+
+# Generate one scenario and time every pipeline phase on it
+# Runs in its own process so the peak RSS reported belongs to this size alone
+# Truck restrictions come from the generated notes, the WGUPS package IDs in truck_assigner do not apply
+def run_case(packages, stops, seed, improve_time_limit, trace_memory) -> dict:
+    recorder = PhaseRecorder(trace_memory)
+    if trace_memory:
+        tracemalloc.start()
+
+    with tempfile.TemporaryDirectory() as directory:
+        generator = ScenarioGenerator(stops, packages, FLEET_SIZE, seed)
+        with recorder.phase('generate'):
+            addresses_path, packages_path, distances_path = generator.write(directory)
+
+        loader = DataLoader(addresses_path, packages_path, distances_path)
+        with recorder.phase('load_addresses'):
+            loader.addresses()
+        with recorder.phase('load_packages'):
+            loader.packages()
+        with recorder.phase('load_distances'):
+            loader.distances()
+        dataset = loader.load()
+
+    for name, table_class in (('hash_table_chaining', HashTableWithChaining),
+                              ('hash_table_open_addressing', HashTableWithOpenAddressing)):
+        with recorder.phase(name):
+            table = table_class()
+            for ID in dataset.package_ids:
+                table.insert(ID, ID)
+            for ID in dataset.package_ids:
+                table.search(ID)
+
+    hub = dataset.addresses[0]
+    fleet = [Truck(ID, hub) for ID in range(1, FLEET_SIZE + 1)]
+    parcels = [copy.copy(dataset.packages.search(ID)) for ID in dataset.package_ids]
+    with recorder.phase('sort_packages'):
+        sort_packages(parcels, fleet, random.Random(seed), note_truck_assigner)
+    # generated loads are far past the WGUPS truck capacity, so only the truck notes constrain moves
+    with recorder.phase('rebalance'):
+        rebalance_trucks(fleet, dataset.distances, lambda package: allowed_trucks(package, fleet, note_truck_assigner),
+                         random.Random(seed), time_limit=improve_time_limit, capacity=len(parcels))
+
+    with recorder.phase('candidate_lists'):
+        candidates = CandidateLists.for_distances(dataset.distances)
+    boundaries = []
+    with recorder.phase('nearest_neighbor'):
+        for truck in fleet:
+            boundaries.append(build_route(truck, dataset.distances, candidates=candidates))
+    with recorder.phase('improve_route'):
+        for truck, last_priority in zip(fleet, boundaries):
+            improve_truck_route(truck, dataset.distances, last_priority, time_limit=improve_time_limit,
+                                candidates=candidates)
+    for truck in fleet:
+        load_truck(truck)
+    with recorder.phase('deliver_packages'):
+        dispatch_trucks(fleet, dataset.distances, time_limit=improve_time_limit)
+
+    if trace_memory:
+        tracemalloc.stop()
+
+    return {
+        'packages': packages,
+        'stops': stops,
+        'trucks': FLEET_SIZE,
+        'seed': seed,
+        'phases': recorder.phases,
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'total_miles': fleet_distance(fleet),
+    }
+
+
+def run_benchmark(sizes, stops=None, seed=0, improve_time_limit=1.0, trace_memory=False) -> dict:
+    results = []
+    for packages in sizes:
+        case_stops = stops or default_stops(packages)
+        # a fresh process per size keeps one run's memory out of the next one's numbers
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            result = executor.submit(run_case, packages, case_stops, seed, improve_time_limit,
+                                     trace_memory).result()
+        results.append(result)
+        phases = ', '.join(f'{name} {value["seconds"]:.3f}s' for name, value in result['phases'].items())
+        print(f'{packages} packages / {case_stops} stops: {phases}')
+
+    return {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'results': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the WGUPS planning pipeline on synthetic scenarios.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='package counts to run')
+    parser.add_argument('--stops', type=int, help='stops per scenario, scales with the package count if omitted')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--improve-time-limit', type=float, default=1.0, help='seconds per route improvement')
+    parser.add_argument('--trace-memory', action='store_true', help='record traced peak memory per phase')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='JSON results file')
+    args = parser.parse_args()
+
+    report = run_benchmark(args.sizes, args.stops, args.seed, args.improve_time_limit,
+                           args.trace_memory)
+    with open(args.output, 'w') as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f'Results written to {os.path.abspath(args.output)}')
+
+
+if __name__ == '__main__':
+    main()
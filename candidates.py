@@ -0,0 +1,58 @@
+import weakref
+
+import numpy as np
+
+# Nearest addresses kept for every address
+CANDIDATE_COUNT = 10
+
+# Lists already built for a distance table, so repeated runs in one process share them
+_built = weakref.WeakKeyDictionary()
+
+
+# For every address, its k nearest other addresses sorted by distance (ties by address ID)
+# Built once per distance table, route construction and local search look here before scanning every stop
+class CandidateLists:
+    def __init__(self, neighbors) -> None:
+        self.neighbors = neighbors  # address ID -> list of nearest address IDs
+
+    @classmethod
+    def from_distances(cls, distances, k=CANDIDATE_COUNT) -> 'CandidateLists':
+        size = len(distances)
+        k = min(k, size - 1)
+        neighbors = []
+        for i in range(size):
+            row = np.array(distances.row(i), dtype=np.float64)
+            row[i] = np.inf
+            if k <= 0:
+                nearest = np.empty(0, dtype=np.intp)
+            elif k < size - 1:
+                nearest = np.argpartition(row, k - 1)[:k]
+            else:
+                nearest = np.flatnonzero(np.arange(size) != i)
+            nearest = nearest[np.lexsort((nearest, row[nearest]))]
+            neighbors.append(nearest.tolist())
+        return cls(neighbors)
+
+    # Lists for distances, built the first time they are asked for
+    @classmethod
+    def for_distances(cls, distances, k=CANDIDATE_COUNT) -> 'CandidateLists':
+        lists = _built.setdefault(distances, {})
+        if k not in lists:
+            lists[k] = cls.from_distances(distances, k)
+        return lists[k]
+
+    def __len__(self) -> int:
+        return len(self.neighbors)
+
+    def __getitem__(self, address: int) -> list[int]:
+        return self.neighbors[address]
+
+    # Nearest address still in remaining, None when every candidate of current has been visited
+    # Staying at current costs nothing, so more packages for the same address come first
+    def nearest(self, current: int, remaining) -> int | None:
+        if current in remaining:
+            return current
+        for address in self.neighbors[current]:
+            if address in remaining:
+                return address
+        return None
@@ -0,0 +1,120 @@
+import csv
+import datetime
+import os
+from typing import NamedTuple
+
+from address import Address
+from address_registry import AddressRegistry
+from distance_matrix import DistanceMatrix, PackedDistanceMatrix
+from hash_table import HashTableWithChaining as HashTable
+from ingest import CHUNK_SIZE, ingest_packages
+from snapshot import read_snapshot, write_snapshot
+
+
+# Address corrections for the WGUPS manifest, package 9 is listed with a wrong address fixed at 10:20
+WGUPS_CORRECTIONS = ((9, '410 S State St', datetime.timedelta(hours=10, minutes=20)),)
+
+
+# Parsed inputs for one simulation run
+# run_simulation copies packages before changing them, so a Dataset is never modified once built
+class Dataset(NamedTuple):
+    addresses: AddressRegistry
+    packages: HashTable
+    package_ids: tuple[int, ...]
+    distances: DistanceMatrix | PackedDistanceMatrix
+
+
+# Reads the three CSV files the first time each structure is needed and caches the result
+# Nothing is read on construction, so importing or creating a loader is free
+# With a cache_dir, load() reads a binary snapshot instead of the CSVs and rebuilds it when a CSV changes,
+# see snapshot.read_snapshot for what is memory mapped
+# With packed_distances_path, distances come from a shared packed float32 file rebuilt when the CSV is newer
+# An already loaded distance table passed as distances is used as is, so several loaders can share one
+class DataLoader:
+    def __init__(self, addresses_path='csv/addresses.csv', packages_path='csv/packages.csv',
+                 distances_path='csv/distances.csv', cache_dir=None, chunk_size=CHUNK_SIZE,
+                 progress=None, packed_distances_path=None, corrections=(), distances=None) -> None:
+        self.addresses_path = addresses_path
+        self.packages_path = packages_path
+        self.distances_path = distances_path
+        self.cache_dir = cache_dir
+        self.chunk_size = chunk_size
+        self.progress = progress  # called with the running package count after each ingest chunk
+        self.packed_distances_path = packed_distances_path
+        self.corrections = corrections
+        self._addresses = None
+        self._packages = None
+        self._distances = distances
+        self._dataset = None
+
+    def addresses(self) -> AddressRegistry:
+        if self._addresses is None:
+            registry = AddressRegistry()
+            with open(self.addresses_path, 'r') as address_file:
+                # Create a registry of Address objects
+                for row in csv.reader(address_file):
+                    registry.add(Address(int(row[0]), row[1], row[2]))
+            self._addresses = registry
+        return self._addresses
+
+    # Create Package objects and extend the Address with the address data
+    # Rows are streamed and inserted in chunks, see ingest.ingest_packages
+    def packages(self) -> HashTable:
+        if self._packages is None:
+            table = HashTable(10)
+            ingest_packages(self.packages_path, self.addresses(), table, self.chunk_size, self.progress)
+            self._packages = table
+        return self._packages
+
+    def distances(self) -> DistanceMatrix | PackedDistanceMatrix:
+        if self._distances is None:
+            if self.packed_distances_path is None:
+                self._distances = DistanceMatrix.from_csv(self.distances_path)
+            elif self._packed_is_current():
+                self._distances = PackedDistanceMatrix.open(self.packed_distances_path)
+            else:
+                self._distances = PackedDistanceMatrix.from_csv(self.distances_path, self.packed_distances_path)
+        return self._distances
+
+    def _packed_is_current(self) -> bool:
+        path = self.packed_distances_path
+        return os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(self.distances_path)
+
+    def sources(self) -> tuple[str, str, str]:
+        return self.addresses_path, self.packages_path, self.distances_path
+
+    def load(self) -> Dataset:
+        if self._dataset is not None:
+            return self._dataset
+
+        dataset = None
+        if self.cache_dir is not None:
+            fields = read_snapshot(self.cache_dir, self.sources())
+            if fields is not None:
+                addresses, packages, package_ids, distances = fields
+                if distances is None or self.packed_distances_path is not None or self._distances is not None:
+                    distances = self.distances()
+                dataset = Dataset(addresses, packages, package_ids, distances)
+
+        if dataset is None:
+            packages = self.packages()
+            package_ids = tuple(sorted(key for key, _ in packages))
+            dataset = Dataset(self.addresses(), packages, package_ids, self.distances())
+            # the snapshot holds the manifest as listed, corrections are applied on every load
+            if self.cache_dir is not None:
+                write_snapshot(self.cache_dir, dataset, self.sources())
+
+        apply_corrections(dataset, self.corrections)
+        self._dataset = dataset
+        return self._dataset
+
+
+# Move packages listed with a wrong address to the right one
+# corrections holds (package ID, correct street, time the correct address is known)
+def apply_corrections(dataset: Dataset, corrections) -> None:
+    for package_id, street, time in corrections:
+        package = dataset.packages.search(package_id)
+        address = dataset.addresses.find(street)
+        if package is None or address is None:
+            raise ValueError(f'Can not correct package {package_id} to {street}')
+        package.change_address(address, time)
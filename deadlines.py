@@ -0,0 +1,311 @@
+import datetime
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+from time_utils import TRUCK_SPEED
+
+# Seconds needed to drive one mile at TRUCK_SPEED
+SECONDS_PER_MILE = 3600 / TRUCK_SPEED
+
+# Slack in seconds ignored as float noise when checking a deadline
+TOLERANCE = 1e-6
+
+# Smallest change in miles that counts as an improvement
+EPSILON = 1e-9
+
+
+# Earliest deadline among the packages for each address, the time the first visit there must happen by
+def stop_deadlines(packages) -> dict[int, datetime.timedelta]:
+    deadlines = {}
+    for package in packages:
+        address = package.address.ID
+        if address not in deadlines or package.deadline < deadlines[address]:
+            deadlines[address] = package.deadline
+    return deadlines
+
+
+# Arrival times and time slack along a route of address IDs for a truck leaving route[0] at leave_time
+# slack[i] is how much later stop i could be reached before its deadline, forward[i] the smallest slack
+# from stop i to the end of the route, so a delay of delay seconds before stop i is on time iff delay <= forward[i]
+# A sparse table over slack answers the smallest slack between any two stops in O(1), which makes every
+# insert, move and swap check below O(1) instead of a re-simulation
+# Packages are delivered on the first visit to their address, later visits carry no deadline
+# move and swap change the route in place and only recompute the schedule from the first stop they touch
+class RouteSchedule:
+    def __init__(self, route, distances, leave_time, deadlines) -> None:
+        self.route = route
+        self.distances = distances
+        self.distance = distances.distance
+        self.deadlines = deadlines
+        travelled = np.concatenate(([0.0], np.cumsum(distances.route_legs(route))))
+        self.arrival = leave_time.total_seconds() + travelled * SECONDS_PER_MILE
+
+        self.due = self._dues()
+        # with an address visited twice a move can change which visit comes first, and so which one is due
+        visited = [address for address in route if address in deadlines]
+        self._repeats = len(set(visited)) < len(visited)
+
+        self.slack = self.due - self.arrival
+        self.forward = np.minimum.accumulate(self.slack[::-1])[::-1]
+        self._table = [self.slack]
+        width = 1
+        while 2 * width <= len(route):
+            previous = self._table[-1]
+            self._table.append(np.minimum(previous[:-width], previous[width:]))
+            width *= 2
+
+    def _dues(self) -> np.ndarray:
+        due = np.full(len(self.route), np.inf)
+        seen = set()
+        for i in range(1, len(self.route)):
+            address = self.route[i]
+            if address not in seen and address in self.deadlines:
+                due[i] = self.deadlines[address].total_seconds()
+            seen.add(address)
+        return due
+
+    # Recompute arrivals and slack from stop first on after the route changed there, O(n) NumPy work
+    # instead of a rebuild, the sparse table only changes in entries that cover first or later stops
+    def _refresh(self, first) -> None:
+        if self._repeats:
+            self.due[:] = self._dues()
+        legs = self.distances.route_legs(self.route[first - 1:])
+        self.arrival[first:] = self.arrival[first - 1] + np.cumsum(legs) * SECONDS_PER_MILE
+        self.slack[first:] = self.due[first:] - self.arrival[first:]
+        if self._repeats:
+            self.slack[:first] = self.due[:first] - self.arrival[:first]
+            first = 0
+        self.forward = np.minimum.accumulate(self.slack[::-1])[::-1]
+        width = 1
+        for level in range(1, len(self._table)):
+            previous = self._table[level - 1]
+            start = max(first - 2 * width + 1, 0)
+            self._table[level][start:] = np.minimum(previous[start:len(previous) - width], previous[start + width:])
+            width *= 2
+
+    # Move the stop at p to between the stops at q and q + 1, see move_cost
+    def move(self, p, q) -> None:
+        target = q + 1 if q < p else q
+        self.route.insert(target, self.route.pop(p))
+        low, high = min(p, target), max(p, target)
+        self.due[low:high + 1] = np.roll(self.due[low:high + 1], 1 if target < p else -1)
+        self._refresh(low)
+
+    # Swap the stops at p < q, see swap_cost
+    def swap(self, p, q) -> None:
+        self.route[p], self.route[q] = self.route[q], self.route[p]
+        self.due[[p, q]] = self.due[[q, p]]
+        self._refresh(p)
+
+    # Smallest slack of the stops first to last inclusive
+    def min_slack(self, first, last) -> float:
+        if first > last:
+            return np.inf
+        level = (last - first + 1).bit_length() - 1
+        table = self._table[level]
+        return min(table[first], table[last - (1 << level) + 1])
+
+    def _after(self, i) -> float:
+        return self.forward[i] if i < len(self.route) else np.inf
+
+    def feasible(self) -> bool:
+        return len(self.route) == 0 or self.forward[0] >= -TOLERANCE
+
+    # Positions of the stops reached after their deadline
+    def late_stops(self) -> list[int]:
+        return [int(i) for i in np.flatnonzero(self.slack < -TOLERANCE)]
+
+    # Change in miles from inserting address, due by due seconds, between stops i and i + 1
+    # None if the new stop or any later stop would be late
+    def insert_cost(self, address, due, i) -> float | None:
+        d = self.distance
+        a = self.route[i]
+        b = self.route[i + 1]
+        if self.arrival[i] + d(a, address) * SECONDS_PER_MILE > due + TOLERANCE:
+            return None
+        cost = d(a, address) + d(address, b) - d(a, b)
+        if cost * SECONDS_PER_MILE > self._after(i + 1) + TOLERANCE:
+            return None
+        return cost
+
+    # Change in miles from moving the stop at p to between the stops at q and q + 1
+    # None if any stop would be late
+    def move_cost(self, p, q) -> float | None:
+        d = self.distance
+        route = self.route
+        x = route[p]
+        saved = d(route[p - 1], x) + d(x, route[p + 1]) - d(route[p - 1], route[p + 1])
+        added = d(route[q], x) + d(x, route[q + 1]) - d(route[q], route[q + 1])
+        if q > p:
+            # stops p + 1 .. q move up by what leaving x out saves, x follows them,
+            # stops after q shift by the net change
+            arrive = self.arrival[q] + (d(route[q], x) - saved) * SECONDS_PER_MILE
+            if -saved * SECONDS_PER_MILE > self.min_slack(p + 1, q) + TOLERANCE:
+                return None
+            if (added - saved) * SECONDS_PER_MILE > self._after(q + 1) + TOLERANCE:
+                return None
+        elif q < p - 1:
+            # stops q + 1 .. p - 1 are pushed back by the detour, stops after p by the net change
+            arrive = self.arrival[q] + d(route[q], x) * SECONDS_PER_MILE
+            if added * SECONDS_PER_MILE > self.min_slack(q + 1, p - 1) + TOLERANCE:
+                return None
+            if (added - saved) * SECONDS_PER_MILE > self._after(p + 1) + TOLERANCE:
+                return None
+        else:
+            return 0.0
+        if arrive > self.due[p] + TOLERANCE:
+            return None
+        return added - saved
+
+    # Change in miles from swapping the stops at p < q
+    # None if any stop would be late
+    def swap_cost(self, p, q) -> float | None:
+        d = self.distance
+        route = self.route
+        a = route[p - 1]
+        x = route[p]
+        y = route[q]
+        f = route[q + 1]
+        arrive_y = self.arrival[p - 1] + d(a, y) * SECONDS_PER_MILE
+        if arrive_y > self.due[q] + TOLERANCE:
+            return None
+        if q == p + 1:
+            arrive_x = arrive_y + d(y, x) * SECONDS_PER_MILE
+            cost = d(a, y) + d(x, f) - d(a, x) - d(y, f)
+        else:
+            c = route[p + 1]
+            e = route[q - 1]
+            # stops between the two shift by the change around p, stops after q by the total
+            shift = d(a, y) + d(y, c) - d(a, x) - d(x, c)
+            if shift * SECONDS_PER_MILE > self.min_slack(p + 1, q - 1) + TOLERANCE:
+                return None
+            arrive_x = self.arrival[q - 1] + (shift + d(e, x)) * SECONDS_PER_MILE
+            cost = shift + d(e, x) + d(x, f) - d(e, y) - d(y, f)
+        if arrive_x > self.due[p] + TOLERANCE:
+            return None
+        if cost * SECONDS_PER_MILE > self._after(q + 1) + TOLERANCE:
+            return None
+        return cost
+
+
+# Deadline aware construction, addresses are inserted tightest deadline first at their cheapest on time
+# position between start and end, an address with no on time position goes where it adds the fewest miles
+# Every position is priced at once with the same checks as RouteSchedule.insert_cost, and arrivals are
+# shifted in place after each insertion, so building a route of n stops is O(n^2) NumPy work
+# Once time_limit seconds have passed the remaining addresses go before end in deadline order
+def deadline_route(start, addresses, distances, leave_time, deadlines, end=0, time_limit=None) -> list[int]:
+    never = datetime.timedelta.max
+    pending = sorted(set(addresses) - {start}, key=lambda address: (deadlines.get(address, never), address))
+    stop_at = None if time_limit is None else time.perf_counter() + time_limit
+
+    route = np.array([start, end], dtype=np.intp)
+    legs = distances.route_legs(route)
+    arrival = leave_time.total_seconds() + np.concatenate(([0.0], legs * SECONDS_PER_MILE))
+    due = np.full(2, np.inf)
+    for n, address in enumerate(pending):
+        if stop_at is not None and time.perf_counter() > stop_at:
+            route = np.concatenate((route[:-1], pending[n:], route[-1:]))
+            break
+        # distance from address to every stop, into[i] from stop i, out[i] on to stop i + 1
+        reach = distances.lookup(route, np.full(len(route), address))
+        into = reach[:-1]
+        out = reach[1:]
+        cost = into + out - legs
+        forward = np.minimum.accumulate((due - arrival)[::-1])[::-1]
+        address_due = deadlines[address].total_seconds() if address in deadlines else np.inf
+        on_time = ((arrival[:-1] + into * SECONDS_PER_MILE <= address_due + TOLERANCE)
+                   & (cost * SECONDS_PER_MILE <= forward[1:] + TOLERANCE))
+        i = int(np.argmin(np.where(on_time, cost, np.inf) if on_time.any() else cost))
+
+        route = np.insert(route, i + 1, address)
+        legs = np.concatenate((legs[:i], (into[i], out[i]), legs[i + 1:]))
+        arrival = np.concatenate((arrival[:i + 1], (arrival[i] + into[i] * SECONDS_PER_MILE,),
+                                  arrival[i + 1:] + cost[i] * SECONDS_PER_MILE))
+        due = np.insert(due, i + 1, address_due)
+    return route.tolist()
+
+
+# One relocate or swap that shortens the route without making any stop late, applied to schedule.route
+# Gives up once the perf_counter deadline has passed
+def _improve_once(schedule, deadline) -> bool:
+    last = len(schedule.route) - 1
+    for p in range(1, last):
+        if deadline is not None and time.perf_counter() > deadline:
+            return False
+        for q in range(0, last):
+            if q == p or q == p - 1:
+                continue
+            cost = schedule.move_cost(p, q)
+            if cost is not None and cost < -EPSILON:
+                schedule.move(p, q)
+                return True
+        for q in range(p + 1, last):
+            cost = schedule.swap_cost(p, q)
+            if cost is not None and cost < -EPSILON:
+                schedule.swap(p, q)
+                return True
+    return False
+
+
+# Make a route meet its stops' deadlines for a truck leaving at leave_time, then shorten it with
+# relocate and swap moves that keep every stop on time
+# A late route is replaced by the deadline aware construction when that one is late at fewer stops
+# The hub stays at both ends, repeat visits to an address in a row are merged since they cost nothing
+# Stops after max_iterations accepted moves or once time_limit seconds have passed, the rebuild included
+def meet_deadlines(route, distances, leave_time, deadlines, max_iterations=1000, time_limit=None) -> list[int]:
+    route = [address for i, address in enumerate(route) if i == 0 or address != route[i - 1]]
+    if len(route) < 3:
+        return route
+
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    schedule = RouteSchedule(route, distances, leave_time, deadlines)
+    if not schedule.feasible():
+        rebuilt = deadline_route(route[0], route[1:-1], distances, leave_time, deadlines, route[-1], time_limit)
+        rebuilt_schedule = RouteSchedule(rebuilt, distances, leave_time, deadlines)
+        if len(rebuilt_schedule.late_stops()) < len(schedule.late_stops()):
+            route = rebuilt
+            schedule = rebuilt_schedule
+    if not schedule.feasible():
+        return route  # moves are only checked against an on time schedule
+
+    iterations = 0
+    while iterations < max_iterations:
+        if not _improve_once(schedule, deadline):
+            break
+        iterations += 1
+    return schedule.route
+
+
+# A package delivered after its deadline, or never delivered
+class DeadlineViolation(NamedTuple):
+    package_id: int
+    truck_id: int
+    deadline: datetime.timedelta
+    delivery_time: datetime.timedelta | None
+
+    def __str__(self) -> str:
+        if self.delivery_time is None:
+            return f'Package {self.package_id} on truck {self.truck_id}: due {self.deadline}, not delivered'
+        late = self.delivery_time - self.deadline
+        return (f'Package {self.package_id} on truck {self.truck_id}: due {self.deadline}, '
+                f'delivered {self.delivery_time} ({late} late)')
+
+
+# Every package of a finished plan that missed its deadline, ordered by package ID
+def deadline_violations(trucks) -> list[DeadlineViolation]:
+    violations = []
+    for truck in trucks:
+        for package in list(truck.delivered or ()) + truck.packages:
+            if package.delivery_time is None or package.delivery_time > package.deadline:
+                violations.append(DeadlineViolation(package.ID, truck.ID, package.deadline, package.delivery_time))
+    return sorted(violations)
+
+
+def format_violations(violations) -> str:
+    if not violations:
+        return 'All deadlines met.'
+    lines = [f'{len(violations)} deadline(s) missed:']
+    lines.extend(f'  {violation}' for violation in violations)
+    return '\n'.join(lines)
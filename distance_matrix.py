@@ -0,0 +1,273 @@
+import csv
+import itertools
+import math
+import os
+
+import numpy as np
+
+# Largest matrix that also gets a nested list copy for scalar lookups
+# The copy makes distance() about twice as fast but takes roughly 4x the array's memory in every process,
+# e.g. ~3 MB at 300 stops against ~128 MB at 2000, so only small tables such as WGUPS's get one
+# Bigger matrices are read straight from the array, and memory mapped data is never copied
+ROW_CACHE_LIMIT = 300
+
+# Most problems listed in a single error message
+MAX_REPORTED_PROBLEMS = 20
+
+
+# Join problem descriptions, long lists are cut short with a count of the rest
+def summarize_problems(problems) -> str:
+    summary = '; '.join(problems[:MAX_REPORTED_PROBLEMS])
+    if len(problems) > MAX_REPORTED_PROBLEMS:
+        summary += f'; and {len(problems) - MAX_REPORTED_PROBLEMS} more'
+    return summary
+
+
+# Number in a distance cell, None after adding a problem if it is not one
+def parse_cell(cell, i, j, problems) -> float | None:
+    try:
+        return float(cell)
+    except ValueError:
+        problems.append(f'non-numeric cell ({i}, {j}): {cell!r}')
+        return None
+
+
+# Stream a lower-triangular distance table as (i, distances from i to 0 .. i - 1)
+# Blank, non-numeric, extra and non-zero diagonal cells are added to problems, filled cells above the diagonal
+# to upper, a bad cell is read as 0 so the rest of the table is still checked
+def read_lower_triangle(rows, size, problems, upper):
+    count = 0
+    for i, row in enumerate(rows):
+        count = i + 1
+        if i >= size:
+            continue
+        if len(row) > size:
+            problems.append(f'row {i} has {len(row)} cells, expected {size}')
+        values = []
+        for j in range(i + 1):
+            cell = row[j].strip() if j < len(row) else ''
+            if not cell:
+                problems.append(f'blank cell ({i}, {j})')
+                values.append(0.0)
+                continue
+            value = parse_cell(cell, i, j, problems)
+            values.append(0.0 if value is None else value)
+        if values[i] != 0.0:
+            problems.append(f'non-zero diagonal cell ({i}, {i})')
+        for j in range(i + 1, min(len(row), size)):
+            cell = row[j].strip()
+            if cell:
+                upper.append((i, j, cell))
+        yield i, values[:i]
+
+    if count != size:
+        problems.append(f'{count} rows, expected {size}')
+
+
+# Take the first row off a stream of rows, the table size is its width unless given
+def _split_first(rows, size):
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return 0, rows
+    return (len(first) if size is None else size), itertools.chain([first], rows)
+
+
+class DistanceMatrix:
+    def __init__(self, data) -> None:
+        self.data = np.ascontiguousarray(data, dtype=np.float64)
+        if self.data.ndim != 2 or self.data.shape[0] != self.data.shape[1]:
+            raise ValueError(f'Distance matrix must be square, got shape {self.data.shape}')
+        # nested lists make single lookups cheaper than indexing the numpy array
+        self._rows = self.data.tolist() if len(self.data) <= ROW_CACHE_LIMIT else None
+
+    # Parse the lower-triangular distances.csv into a symmetric matrix
+    # Rows are streamed from the reader straight into the array, the file is never held as strings
+    # Blank cells below the diagonal and mismatched mirrored cells are reported together
+    @classmethod
+    def from_csv(cls, path: str) -> 'DistanceMatrix':
+        with open(path, 'r') as distance_file:
+            return cls.from_rows(csv.reader(distance_file))
+
+    # rows may be any iterable, the matrix size is taken from the width of the first row unless given
+    @classmethod
+    def from_rows(cls, rows, size=None) -> 'DistanceMatrix':
+        size, rows = _split_first(rows, size)
+        data = np.zeros((size, size), dtype=np.float64)
+        problems = []
+        upper = []  # filled cells above the diagonal, checked once the lower triangle is known
+
+        for i, lower in read_lower_triangle(rows, size, problems, upper):
+            data[i, :i] = lower
+            data[:i, i] = lower
+
+        # the upper triangle is normally blank but must agree with the lower one if given
+        for i, j, cell in upper:
+            value = parse_cell(cell, i, j, problems)
+            if value is not None and value != data[i, j]:
+                problems.append(f'asymmetric cell ({i}, {j}): {cell} != {data[i, j]}')
+
+        if problems:
+            raise ValueError('Invalid distance table: ' + summarize_problems(problems))
+
+        return cls(data)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    # Supports scalar [i, j], row [i] and fancy indexed [rows, cols] lookups
+    def __getitem__(self, key):
+        return self.data[key]
+
+    # O(1) scalar lookup
+    def distance(self, i: int, j: int) -> float:
+        if self._rows is None:
+            return self.data.item(i, j)
+        return self._rows[i][j]
+
+    # Distances from i to every address
+    def row(self, i: int) -> np.ndarray:
+        return self.data[i]
+
+    # Pairwise distances for equal length index sequences
+    def lookup(self, rows, cols) -> np.ndarray:
+        return self.data[np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)]
+
+    # Leg by leg distances along a route
+    def route_legs(self, route) -> np.ndarray:
+        stops = np.asarray(route, dtype=np.intp)
+        return self.data[stops[:-1], stops[1:]]
+
+
+# Strictly lower triangle of a symmetric distance matrix, n(n - 1)/2 float32 values in a raw file
+# The file is memory mapped read only, so processes opening the same file share it through the page cache
+# Same lookup methods as DistanceMatrix
+class PackedDistanceMatrix:
+    DTYPE = np.dtype('<f4')
+
+    def __init__(self, data, size) -> None:
+        self.data = data
+        self.size = size
+
+    # position of (i, j), i > j, in the packed triangle
+    @staticmethod
+    def _offset(i, j):
+        return i * (i - 1) // 2 + j
+
+    @classmethod
+    def open(cls, path: str) -> 'PackedDistanceMatrix':
+        count = os.path.getsize(path) // cls.DTYPE.itemsize
+        size = (1 + math.isqrt(1 + 8 * count)) // 2 if count else 1
+        if size * (size - 1) // 2 != count:
+            raise ValueError(f'{path} does not hold a packed triangle, {count} values')
+        if count == 0:
+            return cls(np.zeros(0, dtype=cls.DTYPE), size)
+        return cls(np.memmap(path, dtype=cls.DTYPE, mode='r'), size)
+
+    # Stream the lower-triangular distances.csv into a packed file at path and open it
+    @classmethod
+    def from_csv(cls, csv_path: str, path: str) -> 'PackedDistanceMatrix':
+        with open(csv_path, 'r') as distance_file:
+            return cls.from_rows(csv.reader(distance_file), path)
+
+    @classmethod
+    def from_rows(cls, rows, path: str, size=None) -> 'PackedDistanceMatrix':
+        size, rows = _split_first(rows, size)
+        count = size * (size - 1) // 2
+        problems = []
+        upper = []
+
+        # build under a temporary name so readers of an existing file are never disturbed
+        # the temporary file is removed if anything fails, e.g. a bad table or a reader error
+        temporary = path + '.tmp'
+        try:
+            if count == 0:
+                open(temporary, 'wb').close()
+                data = np.zeros(0, dtype=cls.DTYPE)
+            else:
+                data = np.memmap(temporary, dtype=cls.DTYPE, mode='w+', shape=(count,))
+            for i, lower in read_lower_triangle(rows, size, problems, upper):
+                data[cls._offset(i, 0):cls._offset(i, i)] = lower
+
+            for i, j, cell in upper:
+                value = parse_cell(cell, i, j, problems)
+                stored = data[cls._offset(j, i)]
+                if value is not None and np.float32(value) != stored:
+                    problems.append(f'asymmetric cell ({i}, {j}): {cell} != {stored}')
+
+            if isinstance(data, np.memmap):
+                data.flush()
+            del data
+            if problems:
+                raise ValueError('Invalid distance table: ' + summarize_problems(problems))
+            os.replace(temporary, path)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+        return cls.open(path)
+
+    # Pack the lower triangle of an existing square matrix, which is trusted to be symmetric
+    @classmethod
+    def from_matrix(cls, matrix, path: str) -> 'PackedDistanceMatrix':
+        size = len(matrix)
+        count = size * (size - 1) // 2
+        temporary = path + '.tmp'
+        try:
+            if count == 0:
+                open(temporary, 'wb').close()
+            else:
+                data = np.memmap(temporary, dtype=cls.DTYPE, mode='w+', shape=(count,))
+                for i in range(1, size):
+                    data[cls._offset(i, 0):cls._offset(i, i)] = matrix[i, :i]
+                data.flush()
+                del data
+            os.replace(temporary, path)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+        return cls.open(path)
+
+    def __len__(self) -> int:
+        return self.size
+
+    # Supports scalar [i, j], row [i] and fancy indexed [rows, cols] lookups
+    def __getitem__(self, key):
+        if isinstance(key, tuple):
+            rows, cols = key
+            if np.ndim(rows) == 0 and np.ndim(cols) == 0:
+                return self.distance(int(rows), int(cols))
+            return self.lookup(rows, cols)
+        return self.row(key)
+
+    def distance(self, i: int, j: int) -> float:
+        if i == j:
+            return 0.0
+        if i < j:
+            i, j = j, i
+        return self.data.item(i * (i - 1) // 2 + j)
+
+    # Distances from i to every address as float64
+    # The part before i is one contiguous slice, the part after is a strided gather
+    def row(self, i: int) -> np.ndarray:
+        result = np.zeros(self.size, dtype=np.float64)
+        result[:i] = self.data[self._offset(i, 0):self._offset(i, i)]
+        after = np.arange(i + 1, self.size, dtype=np.intp)
+        result[i + 1:] = self.data[after * (after - 1) // 2 + i]
+        return result
+
+    # Pairwise distances for equal length index sequences
+    def lookup(self, rows, cols) -> np.ndarray:
+        rows = np.asarray(rows, dtype=np.intp)
+        cols = np.asarray(cols, dtype=np.intp)
+        high = np.maximum(rows, cols)
+        low = np.minimum(rows, cols)
+        same = high == low
+        offsets = np.where(same, 0, high * (high - 1) // 2 + low)
+        if len(self.data) == 0:
+            return np.zeros(offsets.shape, dtype=np.float64)
+        return np.where(same, 0.0, self.data[offsets].astype(np.float64))
+
+    # Leg by leg distances along a route
+    def route_legs(self, route) -> np.ndarray:
+        stops = np.asarray(route, dtype=np.intp)
+        return self.lookup(stops[:-1], stops[1:])
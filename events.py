@@ -0,0 +1,178 @@
+import datetime
+import heapq
+from enum import IntEnum
+
+import numpy as np
+
+from status import Available
+from time_utils import travel_time
+from timeline import hub_arrival
+
+# First time a truck may leave the hub
+DAY_START = datetime.timedelta(hours=8)
+
+# Drivers on shift, a loaded truck needs one to leave the hub
+DRIVER_COUNT = 2
+
+
+# Event kinds, also the processing order of events at the same time
+# Packages and drivers become available before any departure at that time is decided
+class Event(IntEnum):
+    PACKAGE_ARRIVAL = 0  # a delayed package reaches the hub
+    ADDRESS_CORRECTED = 1  # a package's correct address becomes known
+    RETURN_TO_HUB = 2
+    DRIVER_FREE = 3
+    DEPARTURE = 4
+    ARRIVAL = 5  # arrival at a stop on the route
+
+
+class Driver:
+    __slots__ = ('ID', 'status', 'truck')
+
+    def __init__(self, ID) -> None:
+        self.ID = ID
+        self.status = Available.AVAILABLE
+        self.truck = None
+
+    def __str__(self) -> str:
+        return f'Driver {self.ID}: {self.status}'
+
+
+# Heap based discrete event simulation of one delivery day
+# A loaded truck leaves the hub once a driver is free and every one of its packages is ready, that is
+# at the hub (see timeline.hub_arrival) and with its address corrections known, and never before day_start
+# Only driver hand-offs are simulated: a driver coming back frees up for the next truck waiting at the hub,
+# so later departures follow from the returns instead of fixed times
+# Each truck leaves once with the load it was given, a returned truck is not reloaded
+# Only state changes are events, so time jumps straight from one to the next, O(E log E) for E events
+# prepare(truck) is called as a truck leaves, when its leave time is known, and may reorder truck.route
+# free_at[i] is when driver i + 1 is back at the hub, e.g. from a truck still out when a day is replanned,
+# every driver starts free at day_start when it is None
+class DeliverySimulation:
+    def __init__(self, trucks, distances, drivers=DRIVER_COUNT, day_start=DAY_START, prepare=None,
+                 record=False, free_at=None) -> None:
+        self.trucks = trucks
+        self.distances = distances
+        self.drivers = [Driver(ID) for ID in range(1, drivers + 1)]
+        self.day_start = day_start
+        self.free_at = free_at
+        self.prepare = prepare
+        self.log = [] if record else None  # (time, event, truck or driver ID) when recording
+        self._queue = []
+        self._sequence = 0
+        self._free = []  # heap of free driver IDs
+        self._waiting = {}  # truck ID -> packages not ready yet
+        self._ready = []  # heap of truck IDs ready to leave
+        self._trucks = {truck.ID: truck for truck in trucks}
+        self._assigned = {}  # truck ID -> driver, from dispatch until departure
+        self._trips = {}  # truck ID -> _Trip of a truck on the road
+
+    def _push(self, time, event, subject) -> None:
+        heapq.heappush(self._queue, (time, event, self._sequence, subject))
+        self._sequence += 1
+
+    def run(self) -> list:
+        free_at = self.free_at or [self.day_start] * len(self.drivers)
+        for driver, time in zip(self.drivers, free_at):
+            self._push(max(time, self.day_start), Event.DRIVER_FREE, driver)
+        for truck in self.trucks:
+            self._waiting[truck.ID] = 0
+            truck.delivered = []
+            for package in truck.packages + truck.priority_packages:
+                arrival = hub_arrival(package.note)
+                if arrival is not None and arrival > self.day_start:
+                    self._waiting[truck.ID] += 1
+                    self._push(arrival, Event.PACKAGE_ARRIVAL, truck)
+                for changed_at, _ in package.address_changes:
+                    if changed_at > self.day_start:
+                        self._waiting[truck.ID] += 1
+                        self._push(changed_at, Event.ADDRESS_CORRECTED, truck)
+            if self._waiting[truck.ID] == 0:
+                heapq.heappush(self._ready, truck.ID)
+
+        while self._queue:
+            time, event, _, subject = heapq.heappop(self._queue)
+            if self.log is not None:
+                self.log.append((time, event, subject.ID))
+            match event:
+                case Event.PACKAGE_ARRIVAL | Event.ADDRESS_CORRECTED:
+                    self._waiting[subject.ID] -= 1
+                    if self._waiting[subject.ID] == 0:
+                        heapq.heappush(self._ready, subject.ID)
+                case Event.DRIVER_FREE:
+                    subject.status = Available.AVAILABLE
+                    subject.truck = None
+                    heapq.heappush(self._free, subject.ID)
+                case Event.DEPARTURE:
+                    self._depart(subject, time)
+                case Event.ARRIVAL:
+                    self._arrive(subject, time)
+                case Event.RETURN_TO_HUB:
+                    self._return(subject, time)
+            self._dispatch(time)
+        return self.trucks
+
+    # Pair free drivers with ready trucks, lowest IDs first
+    def _dispatch(self, time) -> None:
+        while self._free and self._ready:
+            driver = self.drivers[heapq.heappop(self._free) - 1]
+            truck = self._trucks[heapq.heappop(self._ready)]
+            driver.status = Available.UNAVAILABLE
+            driver.truck = truck
+            self._assigned[truck.ID] = driver
+            self._push(time, Event.DEPARTURE, truck)
+
+    def _depart(self, truck, time) -> None:
+        truck.leave_time = time
+        truck.driver = self._assigned[truck.ID].ID
+        truck.set_package_leave_times()
+        if self.prepare is not None:
+            self.prepare(truck)
+        # distance driven on reaching each stop, each arrival time is the leave time plus the drive to it
+        legs = self.distances.route_legs(truck.route)
+        travelled = truck.total_distance + np.concatenate(([0.0], np.cumsum(legs)))
+        self._trips[truck.ID] = _Trip(travelled, truck.location, self._assigned.pop(truck.ID))
+        self._next_stop(truck)
+
+    def _next_stop(self, truck) -> None:
+        trip = self._trips[truck.ID]
+        trip.stop += 1
+        if trip.stop >= len(truck.route) - 1:
+            trip.stop = max(len(truck.route) - 1, 0)
+            event = Event.RETURN_TO_HUB
+        else:
+            event = Event.ARRIVAL
+        self._push(truck.leave_time + travel_time(float(trip.travelled[trip.stop])), event, truck)
+
+    # Hand over the packages for the stop the truck is at
+    def _deliver(self, truck, time) -> None:
+        trip = self._trips[truck.ID]
+        truck.total_distance = float(trip.travelled[trip.stop])
+        # popping the bucket avoids double delivery if the route passes the address again
+        for package in truck.packages_by_address.pop(truck.route[trip.stop], ()) if truck.route else ():
+            package.delivery_time = time
+            truck.delivered.append(package)
+            truck.location = package.address
+
+    def _arrive(self, truck, time) -> None:
+        self._deliver(truck, time)
+        self._next_stop(truck)
+
+    def _return(self, truck, time) -> None:
+        self._deliver(truck, time)
+        trip = self._trips.pop(truck.ID)
+        truck.location = trip.hub
+        # anything left was not on the route
+        truck.packages = [package for bucket in truck.packages_by_address.values() for package in bucket]
+        self._push(time, Event.DRIVER_FREE, trip.driver)
+
+
+# A truck on the road, travelled[i] is the distance driven on reaching route[i]
+class _Trip:
+    __slots__ = ('travelled', 'hub', 'driver', 'stop')
+
+    def __init__(self, travelled, hub, driver) -> None:
+        self.travelled = travelled
+        self.hub = hub
+        self.driver = driver
+        self.stop = 0
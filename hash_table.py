@@ -1,10 +1,25 @@
 class HashTableWithChaining:
-    def __init__(self, capacity=10):
+    def __init__(self, capacity=10, max_load_factor=1.0):
         self.table = [[] for _ in range(capacity)]
+        self.count = 0
+        self.max_load_factor = max_load_factor
+        self.probes = 0  # items compared by search, read by the instrumentation report
 
     def _hash(self, key):
         return int(key) % len(self.table)
 
+    def __len__(self):
+        return self.count
+
+    # Double the bucket count and rehash every item once the table gets too full
+    # Doubling keeps the rehash cost amortized O(1) per insert
+    def _resize(self, capacity):
+        old_table = self.table
+        self.table = [[] for _ in range(capacity)]
+        for bucket_list in old_table:
+            for item in bucket_list:
+                self.table[self._hash(item[0])].append(item)
+
     # Part A: insert data
     def insert(self, key, value):
         bucket = self._hash(key)
@@ -18,9 +33,13 @@ class HashTableWithChaining:
                 item[1] = value
                 return
         bucket_list.append([int(key), value])
+        self.count += 1
+
+        if self.count > self.max_load_factor * len(self.table):
+            self._resize(len(self.table) * 2)
 
     # Search for an item in the table
-    # O(n) time complexity
+    # O(1) average time complexity while the load factor is bounded
     # Part B: search
     def search(self, key):
         bucket = self._hash(key)
@@ -28,15 +47,17 @@ class HashTableWithChaining:
 
         # iterate the data in the bucket, return wanted data item
         # checks in O(N) where N is bucket_row length
-        for data in bucket_row:
+        for i, data in enumerate(bucket_row):
             if data[0] == key:
+                self.probes += i + 1
                 return data[1]
+        self.probes += len(bucket_row)
 
         # if key not in table return nothing
         print('Key not found')
         return None
 
-    # O(n) time complexity for deletion
+    # O(1) average time complexity for deletion
     def delete(self, key):
         bucket = self._hash(key)
         bucket_list = self.table[bucket]
@@ -44,6 +65,7 @@ class HashTableWithChaining:
         for item in bucket_list:
             if int(item[0]) == key:
                 bucket_list.remove(item)
+                self.count -= 1
                 return
 
     def __str__(self):
@@ -54,3 +76,115 @@ class HashTableWithChaining:
         for bucket in self.table:
             for item in bucket:
                 yield item
+
+
+# Slot markers for open addressing, pickled by name so copies sent to worker processes stay identical
+class _Marker:
+    def __init__(self, name):
+        self.name = name
+
+    def __reduce__(self):
+        return self.name
+
+    def __repr__(self):
+        return self.name
+
+
+_EMPTY = _Marker('_EMPTY')
+_DELETED = _Marker('_DELETED')
+
+
+# Linear probing hash table with keys and values kept in parallel lists
+# Same insert/search/delete/__iter__ API as HashTableWithChaining without a list per item
+class HashTableWithOpenAddressing:
+    def __init__(self, capacity=16, max_load_factor=0.7):
+        self.keys = [_EMPTY] * capacity
+        self.values = [None] * capacity
+        self.count = 0
+        self.used = 0  # live items plus deleted markers, both lengthen probe runs
+        self.max_load_factor = max_load_factor
+        self.probes = 0  # slots examined by lookups, read by the instrumentation report
+
+    def _hash(self, key):
+        return int(key) % len(self.keys)
+
+    def __len__(self):
+        return self.count
+
+    # Return the slot holding key, or None
+    def _find(self, key):
+        capacity = len(self.keys)
+        slot = self._hash(key)
+        for probe in range(1, capacity + 1):
+            current = self.keys[slot]
+            if current is _EMPTY or (current is not _DELETED and current == key):
+                self.probes += probe
+                return None if current is _EMPTY else slot
+            slot = (slot + 1) % capacity
+        self.probes += capacity
+        return None
+
+    # Rehash live items into a new table, deleted markers are dropped
+    def _resize(self, capacity):
+        old_keys = self.keys
+        old_values = self.values
+        self.keys = [_EMPTY] * capacity
+        self.values = [None] * capacity
+        self.count = 0
+        self.used = 0
+        for key, value in zip(old_keys, old_values):
+            if key is not _EMPTY and key is not _DELETED:
+                self.insert(key, value)
+
+    # Part A: insert data
+    # Amortized O(1), the table doubles once live items and deleted markers pass the load factor
+    def insert(self, key, value):
+        key = int(key)
+        slot = self._find(key)
+        if slot is not None:
+            self.values[slot] = value
+            return
+
+        if self.used + 1 > self.max_load_factor * len(self.keys):
+            # only grow when live items fill the table, otherwise rehashing clears deleted markers
+            grow = self.count + 1 > self.max_load_factor * len(self.keys) / 2
+            self._resize(len(self.keys) * 2 if grow else len(self.keys))
+
+        # reuse the first empty or deleted slot in the probe run
+        capacity = len(self.keys)
+        slot = self._hash(key)
+        while self.keys[slot] is not _EMPTY and self.keys[slot] is not _DELETED:
+            slot = (slot + 1) % capacity
+        if self.keys[slot] is _EMPTY:
+            self.used += 1
+        self.keys[slot] = key
+        self.values[slot] = value
+        self.count += 1
+
+    # Part B: search
+    # O(1) average time complexity
+    def search(self, key):
+        slot = self._find(key)
+        if slot is None:
+            # if key not in table return nothing
+            print('Key not found')
+            return None
+        return self.values[slot]
+
+    # O(1) average time complexity for deletion, the slot is marked so later probes continue past it
+    def delete(self, key):
+        slot = self._find(key)
+        if slot is None:
+            return
+        self.keys[slot] = _DELETED
+        self.values[slot] = None
+        self.count -= 1
+
+    def __str__(self):
+        return str([list(item) for item in self])
+
+    # Make the hash table iterable
+    def __iter__(self):
+        for key, value in zip(self.keys, self.values):
+            if key is not _EMPTY and key is not _DELETED:
+                yield [key, value]
@@ -0,0 +1,78 @@
+import csv
+import datetime
+import itertools
+
+from distance_matrix import summarize_problems
+from package import Package
+from time_utils import convert_time
+
+# Packages parsed and inserted per batch
+CHUNK_SIZE = 10000
+
+
+# Stream rows from a CSV file one at a time
+def read_rows(path):
+    with open(path, 'r', newline='') as csv_file:
+        yield from csv.reader(csv_file)
+
+
+# Group an iterable into lists of at most size items
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# Turn package rows into Package objects with their Address resolved
+# Yields (package, None) for good rows and (None, problem) for rows that can not be used
+def parse_packages(rows, addresses):
+    for line, row in enumerate(rows, start=1):
+        # 1,195 W Oakland Ave,Salt Lake City,UT,84115,10:30 AM,21,
+        if len(row) < 8:
+            yield None, f'line {line}: expected 8 columns, got {len(row)}'
+            continue
+        try:
+            parcel = Package(int(row[0]), row[6], row[7])
+            parcel.deadline = convert_time(row[5])
+        except (ValueError, IndexError):
+            yield None, f'line {line}: bad package ID or deadline'
+            continue
+
+        address = addresses.find(row[1])
+        if address is None:
+            yield None, f'package {row[0]}: {row[1]}'
+            continue
+        address.city = row[2]
+        address.state = row[3]
+        address.zip = row[4]
+        parcel.address = address
+
+        if parcel.deadline <= datetime.timedelta(hours=10, minutes=30):
+            parcel.is_priority = True
+
+        yield parcel, None
+
+
+# Stream packages from path into table chunk_size rows at a time
+# Only one chunk of rows is held in memory, progress(count) is called after each chunk
+# Every bad row is reported together once the whole file has been read
+def ingest_packages(path, addresses, table, chunk_size=CHUNK_SIZE, progress=None) -> int:
+    count = 0
+    problems = []
+    for chunk in chunked(parse_packages(read_rows(path), addresses), chunk_size):
+        for parcel, problem in chunk:
+            if problem is not None:
+                problems.append(problem)
+                continue
+            # Insert package into hash table with package ID as key and package data as value
+            table.insert(parcel.ID, parcel)
+            count += 1
+        if progress is not None:
+            progress(count)
+
+    if problems:
+        raise ValueError('Invalid packages: ' + summarize_problems(problems))
+    return count
@@ -0,0 +1,138 @@
+import contextlib
+import cProfile
+import io
+import pstats
+import time
+
+# Functions listed in a profile report
+PROFILE_LINES = 25
+
+
+# Accumulates phase timings and counters for one planning run
+# A disabled instance does nothing, so run_simulation can always call it
+class Instrumentation:
+    def __init__(self, enabled=True, profile=False) -> None:
+        self.enabled = enabled
+        self.phases: dict[str, list] = {}  # name -> [seconds, calls]
+        self.counters: dict[str, int] = {}
+        self.profiler = cProfile.Profile() if enabled and profile else None
+        self.profile_text = None  # profile merged from another report
+
+    # Time a block, repeated blocks with the same name add up
+    def phase(self, name):
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return _Timer(self, name)
+
+    def count(self, name, amount=1) -> None:
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    # Run the profiler, if there is one, around a block
+    @contextlib.contextmanager
+    def profiling(self):
+        if self.profiler is None:
+            yield
+            return
+        self.profiler.enable()
+        try:
+            yield
+        finally:
+            self.profiler.disable()
+
+    # Wrap a distance matrix so its lookups are counted, returned unchanged when disabled
+    def distances(self, distances):
+        if not self.enabled:
+            return distances
+        return CountingDistances(distances, self)
+
+    # Add the phases and counters of a report made elsewhere, such as in a planner worker
+    def merge(self, report) -> None:
+        if not self.enabled or report is None:
+            return
+        for name, phase in report['phases'].items():
+            totals = self.phases.setdefault(name, [0.0, 0])
+            totals[0] += phase['seconds']
+            totals[1] += phase['calls']
+        for name, value in report['counters'].items():
+            self.count(name, value)
+        if report['profile']:
+            self.profile_text = report['profile']
+
+    def report(self) -> dict:
+        profile = self.profile_text
+        if self.profiler is not None:
+            output = io.StringIO()
+            pstats.Stats(self.profiler, stream=output).sort_stats('cumulative').print_stats(PROFILE_LINES)
+            profile = output.getvalue()
+        return {
+            'phases': {name: {'seconds': seconds, 'calls': calls} for name, (seconds, calls) in self.phases.items()},
+            'counters': dict(self.counters),
+            'profile': profile,
+        }
+
+
+# Shared instance for runs without instrumentation
+DISABLED = Instrumentation(enabled=False)
+
+
+class _Timer:
+    def __init__(self, instrumentation, name) -> None:
+        self.instrumentation = instrumentation
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        totals = self.instrumentation.phases.setdefault(self.name, [0.0, 0])
+        totals[0] += time.perf_counter() - self.start
+        totals[1] += 1
+        return False
+
+
+# Distance matrix proxy that counts every lookup
+class CountingDistances:
+    def __init__(self, distances, instrumentation) -> None:
+        self.distances = distances
+        self.instrumentation = instrumentation
+
+    def __len__(self) -> int:
+        return len(self.distances)
+
+    def __getitem__(self, key):
+        self.instrumentation.count('distance_index_calls')
+        return self.distances[key]
+
+    def distance(self, i, j) -> float:
+        self.instrumentation.count('distance_calls')
+        return self.distances.distance(i, j)
+
+    def row(self, i):
+        self.instrumentation.count('distance_row_calls')
+        return self.distances.row(i)
+
+    def lookup(self, rows, cols):
+        self.instrumentation.count('distance_batch_calls')
+        return self.distances.lookup(rows, cols)
+
+    def route_legs(self, route):
+        self.instrumentation.count('distance_batch_calls')
+        return self.distances.route_legs(route)
+
+
+# Printable form of a report for the CLI
+def format_report(report) -> str:
+    lines = ['Phase timings:']
+    for name, phase in report['phases'].items():
+        lines.append(f'  {name:<20} {phase["seconds"] * 1000:10.2f} ms  ({phase["calls"]} calls)')
+    if report['counters']:
+        lines.append('Counters:')
+        for name, value in report['counters'].items():
+            lines.append(f'  {name:<20} {value:>10}')
+    if report['profile']:
+        lines.append('Profile:')
+        lines.append(report['profile'])
+    return '\n'.join(lines)
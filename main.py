@@ -2,120 +2,55 @@
 # Student ID: 011258802
 # C950
 
+import copy
 import datetime
 import random
+import re
 
-import csv
 from address import Address
-from hash_table import HashTableWithChaining as HashTable
-from package import Package
-from status import Status
+from address_registry import AddressRegistry
+from candidates import CANDIDATE_COUNT, CandidateLists
+from dataset import WGUPS_CORRECTIONS, DataLoader, Dataset
+from deadlines import deadline_violations, format_violations, meet_deadlines, stop_deadlines
+from events import DRIVER_COUNT, DeliverySimulation
+from instrumentation import DISABLED, Instrumentation, format_report
+from distance_matrix import DistanceMatrix
+from held_karp import HELD_KARP_LIMIT, distinct_stops, held_karp_route
+from package_store import PackageStore
+from planner import multi_start
+from route_cache import ROUTE_CACHE_SIZE, RouteCache
+from route_optimizer import improve_route, nearest_neighbor, route_length
+from query_cache import StatusCache
+from rebalance import REBALANCE_ITERATIONS, rebalance_trucks
+from timeline import PackageTimeline
+from time_utils import convert_time
 from truck import Truck
 
-#
-# Global state
-#
-ADDRESSES = []
-PACKAGES = HashTable(10)
-DISTANCES = {}
-
-
-# Convert time string to minutes
-# "10:30 AM" -> 10:30 , "10:30 PM"-> 22:30
-def convert_time(time_str) -> datetime.timedelta:
-    if time_str == 'EOD':
-        return datetime.timedelta(hours=22, minutes=0)
-    time = time_str.split(':')
-    hour = int(time[0])
-    minute = int(time[1].split(' ')[0])
-    if len(time[1]) > 2 and time[1].split(' ')[1] == 'PM':
-        hour += 12
-    return datetime.timedelta(hours=hour, minutes=minute)
-
-
-print('Loading addresses...')
-with open('csv/addresses.csv', 'r') as address_file:
-    address_data = csv.reader(address_file)
-    address_data = list(address_data)
-
-# Create a list of Address objects
-for address in address_data:
-    addr = Address(int(address[0]), address[1], address[2])
-    ADDRESSES.insert(addr.ID, addr)
-
-print('Loading packages...')
-with open('csv/packages.csv', 'r') as package_file:
-    package_data = csv.reader(package_file)
-    package_data = list(package_data)
-
-# Create a list of Package objects and extend the Address with the address data
-for package in package_data:
-    # 1,195 W Oakland Ave,Salt Lake City,UT,84115,10:30 AM,21,
-    parcel = Package(int(package[0]), package[6], package[7])
-
-    for address in ADDRESSES:
-        if address.street == package[1]:
-            address.street = package[1]
-            address.city = package[2]
-            address.state = package[3]
-            address.zip = package[4]
-            parcel.address = address
-            break
-
-    parcel.deadline = convert_time(package[5])
-
-    if parcel.deadline <= datetime.timedelta(hours=10, minutes=30):
-        parcel.is_priority = True
-
-    if parcel.ID == 9:
-        parcel.address = ADDRESSES[19]
-
-    # Insert package into hash table with package ID as key and package data as value
-    PACKAGES.insert(parcel.ID, parcel)
-
-print('Populating distance dictionary...')
-with open('csv/distances.csv', 'r') as distance_file:
-    distance_data = csv.reader(distance_file)
-    distance_data = list(distance_data)
-
-for i in range(len(distance_data)):
-    for j in range(len(distance_data[i])):
-        if distance_data[i][j]:
-            DISTANCES[i, j] = float(distance_data[i][j])
-        else:
-            DISTANCES[j, i] = 0.0
+# Multi-start planner settings
+DISTANCE_TARGET = 140  # miles, planning stops at the first plan under this
+PLANNER_WORKERS = None  # None uses every CPU
+PLANNER_SEEDS = range(256)
+PLANNER_TIME_BUDGET = 30.0  # seconds
 
+# Parsed CSV data is cached here between runs
+SNAPSHOT_DIR = '.snapshot'
 
-#
-# Helper functions
-#
-def get_address_by_street(address_list, street: str) -> Address or None:
-    for addr in address_list:
-        if addr.street == street:
-            return addr
-    return None
-
-
-# find all packages at a given address to avoid route loops
-def get_packages_by_address(package_list, address: int) -> list:
-    packages = []
-    for package in package_list:
-        if package.address.ID == address:
-            packages.append(package)
-    return packages
+# Truck routes memoized per process, set ROUTE_CACHE_PATH to share them through a file across processes and runs
+# Both are read when run_simulation runs, see shared_route_cache
+ROUTE_CACHE_PATH = None
+_route_cache = None
 
+# Print phase timings and counters after planning, optionally with a cProfile of the chosen run
+INSTRUMENT = False
+PROFILE = False
 
-# get_distance returns the distance between two addresses
-def get_distance(i: int, j: int) -> float:
-    i = int(i)
-    j = int(j)
-    if i == j:  # same address, no distance
-        return 0.0
 
-    if (i, j) in DISTANCES:
-        return DISTANCES[i, j]
-    else:
-        return DISTANCES[j, i]
+#
+# Helper functions
+#
+# O(1) lookup through the registry's normalized street index
+def get_address_by_street(address_list: AddressRegistry, street: str) -> Address or None:
+    return address_list.find(street)
 
 
 # truck_assigner assigns packages to a truck based on restrictions given in the notes column of the packages.csv file
@@ -142,22 +77,40 @@ def truck_assigner(package) -> int | None:
     return None
 
 
+_TRUCK_NOTE = re.compile(r'can only be on truck (\d+)', re.IGNORECASE)
+
+
+# note_truck_assigner reads "Can only be on truck N" from the notes column alone
+# used for manifests other than the WGUPS one, such as generated scenarios, whose IDs mean nothing to truck_assigner
+def note_truck_assigner(package) -> int | None:
+    match = _TRUCK_NOTE.search(package.note or '')
+    return None if match is None else int(match.group(1))
+
+
+# Trucks a package may be carried on, restricted packages have one, priority packages go out on the first two
+def allowed_trucks(package, trucks: list[Truck], assigner=truck_assigner) -> list[Truck]:
+    choice = assigner(package)
+    if choice is not None:
+        return [trucks[choice - 1]]
+    if package.is_priority:
+        return trucks[:2]
+    return trucks
+
+
 # distribute packages to trucks based on priority, standard and truck capacity
-def sort_packages(packages, trucks):
+# rng picks the truck for unrestricted priority packages
+# assigner(package) gives the truck number a package is restricted to, or None
+def sort_packages(packages, trucks, rng=random, assigner=truck_assigner):
     standard_packages = []
     for package in packages:
         if package.is_priority:
-            choice = truck_assigner(package)
+            choice = assigner(package)
             if choice is None:
-                choice = random.randint(1, 2)
-            if choice == 1:
-                trucks[0].priority_packages.append(package)
-                package.truck = trucks[0].ID
-            else:
-                trucks[1].priority_packages.append(package)
-                package.truck = trucks[1].ID
+                choice = rng.randint(1, 2)
+            trucks[choice - 1].priority_packages.append(package)
+            package.truck = trucks[choice - 1].ID
         else:
-            choice = truck_assigner(package)
+            choice = assigner(package)
             if choice is None:
                 standard_packages.append(package)  # add to standard packages list
             else:
@@ -184,27 +137,6 @@ def sort_packages(packages, trucks):
             package.truck = trucks[2].ID
 
 
-# get_status_at_time returns the status of a package at a given time
-def get_status_at_time(package, time):
-    if package.ID == 9:
-        delay_time = datetime.timedelta(hours=10, minutes=20)
-        if time < delay_time:
-            return Status.AT_HUB
-        elif delay_time < time < package.delivery_time:
-            return Status.OUT_FOR_DELIVERY
-        elif time >= package.delivery_time:
-            return Status.DELIVERED
-
-    if package.leave_time is None:
-        return Status.AT_HUB
-    elif time < package.leave_time:
-        return Status.AT_HUB
-    elif time < package.delivery_time:
-        return Status.OUT_FOR_DELIVERY
-    elif time >= package.delivery_time:
-        return str(Status.DELIVERED) + f' at {package.delivery_time}'
-
-
 # Helper function to print out truck packages and routes for debugging
 def print_out_packages(trucks):
     print()
@@ -223,109 +155,158 @@ def print_out_packages(trucks):
         std.clear()
 
 
-# Nearest neighbor algorithm
-# O(N^2) time complexity
-# Consume a list of packages and return a route of addresses
-def nearest_neighbor(start, packages_list):
-    packages = packages_list.copy()
-    route = [start]
-    current = start
-    while len(packages) > 0:
-        nearest = None
-        for package in packages:
-            if nearest is None:
-                nearest = package
-            if get_distance(current, package.address.ID) < get_distance(current, nearest.address.ID):
-                nearest = package
-        route.append(nearest.address.ID)
-        current = nearest.address.ID
-        packages.remove(nearest)
-    return route
-
-
-# deliver_packages iterates through the truck's route and filters out packages that are to be delivered at each address
-# also calculates the total distance traveled by the truck and the time each package is delivered as the truck travels
-# O(N^2) time complexity, where N is the number of packages at any given address
-def deliver_packages(truck) -> list[Package]:
-    current = truck.route[0]  # start at the first address in the route
-    delivered = []  # list of packages that have been delivered for reference later
-    for i in range(1, len(truck.route)):
-        next_local = truck.route[i]
-
-        distance = get_distance(current, next_local)
-        truck.total_distance += distance
-
-        # get any packages on the truck at the current address and deliver them together
-        curr_packages = get_packages_by_address(truck.packages, next_local)
-        for package in curr_packages:
-            # convert distance to time in minutes and add to leave time
-            delivery_time = truck.leave_time + datetime.timedelta(minutes=truck.total_distance / 18 * 60)
-
-            package.delivery_time = delivery_time  # set delivery time for package
-            delivered.append(package)
-
-        # filter out delivered packages to avoid double delivery
-        truck.packages = [package for package in truck.packages if package not in curr_packages]
-        current = next_local
-
-    return delivered
-
-
 #
 # Main control flow
 #
 
 
-def run_simulation() -> list[Truck]:
-    # create trucks
-    truck1 = Truck(1, ADDRESSES[0])
-    truck2 = Truck(2, ADDRESSES[0])
-    truck3 = Truck(3, ADDRESSES[0])
-
-    trucks = [truck1, truck2, truck3]
-
-    # load priority packages
-    packages = [PACKAGES.search(i) for i in range(1, 41)]
-
-    # sort packages to priority and standard lists
-    sort_packages(packages, trucks)
-
-    # Nearest neighbor optimization
-    for truck in trucks:
-        # starting at hub, find nearest neighbor path for priority packages
-        temp_list = nearest_neighbor(0, truck.priority_packages)
-
-        # add the optimized route to the truck's route
-        truck.route.extend(temp_list)
-
-        # remove all but the last element
-        temp_list = temp_list[-1:]
-
-        # starting at last element of temp list, find nearest neighbor path for standard packages
-        temp_list = nearest_neighbor(temp_list[0], truck.packages)
-        temp_list = temp_list[1:]
-
-        truck.route.extend(temp_list)
-        truck.route.append(0)
-
-        truck.packages.extend(truck.priority_packages)
-        truck.priority_packages.clear()
-
-    # iterate through the route and calculate the total distance
-    trucks[0].leave_time = datetime.timedelta(hours=8, minutes=0)
-    trucks[0].set_package_leave_times()
-    trucks[0].delivered = deliver_packages(trucks[0])
-
-    trucks[1].leave_time = datetime.timedelta(hours=9, minutes=5)
-    trucks[1].set_package_leave_times()
-    trucks[1].delivered = deliver_packages(trucks[1])
-
-    truck3_leave_time = max(
-        datetime.timedelta(hours=10, minutes=20),
-        truck1.leave_time + datetime.timedelta(minutes=truck1.total_distance / 18))
-    trucks[2].leave_time = truck3_leave_time
-    trucks[2].set_package_leave_times()
-    trucks[2].delivered = deliver_packages(trucks[2])
+# Route for a truck, priority packages first, starting and ending at the hub
+# Trucks with at most exact_limit distinct addresses get the exact Held-Karp route, larger ones nearest neighbor
+# Returns the index of the last priority stop, standard deliveries start from there
+def build_route(truck, distances: DistanceMatrix, exact_limit=HELD_KARP_LIMIT,
+                candidates: CandidateLists = None) -> int:
+    priority_addresses = [package.address.ID for package in truck.priority_packages]
+    standard_addresses = [package.address.ID for package in truck.packages]
+    if distinct_stops(priority_addresses + standard_addresses) <= exact_limit:
+        route, last_priority = held_karp_route(priority_addresses, standard_addresses, distances)
+        truck.route.extend(route)
+        return last_priority
+
+    # starting at hub, find nearest neighbor path for priority packages
+    temp_list = nearest_neighbor(0, truck.priority_packages, distances, candidates)
+
+    # add the optimized route to the truck's route
+    truck.route.extend(temp_list)
+
+    # index of the last priority stop, standard deliveries start from here
+    last_priority = len(truck.route) - 1
+
+    # remove all but the last element
+    temp_list = temp_list[-1:]
+
+    # starting at last element of temp list, find nearest neighbor path for standard packages
+    temp_list = nearest_neighbor(temp_list[0], truck.packages, distances, candidates)
+    temp_list = temp_list[1:]
+
+    truck.route.extend(temp_list)
+    truck.route.append(0)
+    return last_priority
+
+
+# 2-opt / Or-opt improvement, priority and standard legs are improved separately
+# so priority packages are still delivered first and the hub stays at both ends
+def improve_truck_route(truck, distances: DistanceMatrix, last_priority: int, max_iterations=1000, time_limit=None,
+                        candidates: CandidateLists = None):
+    truck.route = improve_route(truck.route, distances, 0, last_priority, max_iterations, time_limit, candidates)
+    truck.route = improve_route(truck.route, distances, last_priority, len(truck.route) - 1,
+                                max_iterations, time_limit, candidates)
+
+
+# Merge priority packages into the truck's load and index it by address for delivery
+def load_truck(truck):
+    truck.packages.extend(truck.priority_packages)
+    truck.priority_packages.clear()
+    truck.index_packages_by_address()
+
+
+# Reorder a loaded truck's route so its packages make their deadlines from its leave time
+# and shorten it where that keeps every stop on time, see deadlines.meet_deadlines
+def schedule_route(truck, distances: DistanceMatrix, max_iterations=1000, time_limit=None):
+    truck.route = meet_deadlines(truck.route, distances, truck.leave_time, stop_deadlines(truck.packages),
+                                 max_iterations, time_limit)
+
+
+# Send the trucks out and deliver along their routes
+# Departures follow from driver availability and when each truck's packages are ready, see events.DeliverySimulation
+def dispatch_trucks(trucks: list[Truck], distances: DistanceMatrix, max_iterations=1000, time_limit=None,
+                    drivers=DRIVER_COUNT):
+    simulation = DeliverySimulation(trucks, distances, drivers,
+                                    prepare=lambda truck: schedule_route(truck, distances, max_iterations, time_limit))
+    simulation.run()
+
+
+# The process's route cache for the current ROUTE_CACHE_SIZE and ROUTE_CACHE_PATH, made on first use
+# and replaced when either setting has changed since
+def shared_route_cache() -> RouteCache:
+    global _route_cache
+    settings = (ROUTE_CACHE_SIZE, ROUTE_CACHE_PATH)
+    if _route_cache is None or (_route_cache.memory.capacity, _route_cache.path) != settings:
+        if _route_cache is not None:
+            _route_cache.close()
+        _route_cache = RouteCache(ROUTE_CACHE_SIZE, ROUTE_CACHE_PATH)
+    return _route_cache
+
+
+# Each run works on its own copies of the dataset's packages so runs never share state
+# Pass an Instrumentation to record phase timings and distance / hash table counters for the run
+# exact_limit is the largest distinct address count routed exactly, 0 always uses the heuristics
+# candidate_count is how many nearest addresses the heuristics check before scanning every stop
+# rebalance_iterations is how many moves between trucks are tried, 0 keeps sort_packages' split,
+# with rebalance_time_limit moves are tried for that many seconds instead
+# route_cache memoizes truck routes by stops and settings, None uses shared_route_cache(),
+# False routes every truck from scratch
+# assigner(package) gives the truck a package is restricted to, use note_truck_assigner for manifests
+# other than the WGUPS one
+def run_simulation(dataset: Dataset, seed=None, max_iterations=1000, time_limit=None,
+                   instrumentation: Instrumentation = DISABLED, exact_limit=HELD_KARP_LIMIT,
+                   candidate_count=CANDIDATE_COUNT, rebalance_iterations=REBALANCE_ITERATIONS,
+                   rebalance_time_limit=None, route_cache: RouteCache | bool | None = None,
+                   assigner=truck_assigner) -> list[Truck]:
+    if route_cache is None:
+        route_cache = shared_route_cache()
+    with instrumentation.profiling():
+        distances = instrumentation.distances(dataset.distances)
+        hub = dataset.addresses[0]
+
+        # create trucks
+        truck1 = Truck(1, hub)
+        truck2 = Truck(2, hub)
+        truck3 = Truck(3, hub)
+
+        trucks = [truck1, truck2, truck3]
+
+        # load priority packages
+        probes = dataset.packages.probes
+        packages = [copy.copy(dataset.packages.search(i)) for i in dataset.package_ids]
+        instrumentation.count('hash_table_probes', dataset.packages.probes - probes)
+
+        # sort packages to priority and standard lists
+        rng = random.Random(seed)
+        with instrumentation.phase('sort_packages'):
+            sort_packages(packages, trucks, rng, assigner)
+
+        # move packages between trucks where that shortens the fleet's routes
+        with instrumentation.phase('rebalance'):
+            rebalance_trucks(trucks, distances, lambda package: allowed_trucks(package, trucks, assigner), rng,
+                             rebalance_iterations, rebalance_time_limit)
+
+        # nearest addresses per address, shared by every run on the same distance table
+        with instrumentation.phase('candidate_lists'):
+            candidates = CandidateLists.for_distances(dataset.distances, candidate_count)
+
+        # Nearest neighbor optimization, trucks whose stops were routed before reuse that route
+        settings = (exact_limit, candidate_count, max_iterations, time_limit)
+        for truck in trucks:
+            key = None
+            if route_cache:
+                key = RouteCache.key(dataset.distances, 0, [package.address.ID for package in truck.priority_packages],
+                                     [package.address.ID for package in truck.packages], settings)
+                cached = route_cache.get(key)
+                if cached is not None:
+                    instrumentation.count('route_cache_hits')
+                    truck.route = list(cached.route)
+                    load_truck(truck)
+                    continue
+            with instrumentation.phase('nearest_neighbor'):
+                last_priority = build_route(truck, distances, exact_limit, candidates)
+            with instrumentation.phase('improve_route'):
+                improve_truck_route(truck, distances, last_priority, max_iterations, time_limit, candidates)
+            if key is not None:
+                route_cache.put(key, truck.route, last_priority, route_length(truck.route, dataset.distances))
+            load_truck(truck)
+
+        with instrumentation.phase('deliver_packages'):
+            dispatch_trucks(trucks, distances, max_iterations, time_limit)
 
     # print_out_packages(trucks)
     return trucks
@@ -347,7 +328,14 @@ def intro():
     print('Starting Service...')
 
 
-def user_interface(trucks: list[Truck]):
+# Time package lists without a time are printed at, late enough that every package is delivered
+END_OF_DAY = datetime.timedelta(hours=22, minutes=0)
+
+
+# packages holds the simulated copies of every package, timeline their status transitions
+# Lines for lookups repeated at the same times come from a StatusCache
+def user_interface(trucks: list[Truck], packages: PackageStore, timeline: PackageTimeline):
+    cache = StatusCache(packages, timeline)
     menu = """
             Please select an option:
             1. Lookup package at exact time
@@ -363,27 +351,24 @@ def user_interface(trucks: list[Truck]):
         match user_input:
             case '1':
                 package_id = input('\nEnter package ID: ')
-                package: Package | None = PACKAGES.search(int(package_id))
+                package = packages.search(int(package_id))
                 if package is None:
                     print('Package not found or does not exist.')
                     input('Press Enter to continue...')
                     break
                 search_time = input('Enter time to search for package: (HH:MM) ')
                 search_time = convert_time(search_time)
-                print(package.package_print_out(search_time) + ' -- ' + str(get_status_at_time(package, search_time)))
+                print(cache.line(package, search_time))
                 input('Press Enter to continue...')
             case '2':
-                package_list = [PACKAGES.search(i) for i in range(1, 41)]
-                for package in package_list:
-                    print(package.package_print_out(datetime.timedelta(hours=22, minutes=0)))
+                for package in packages:
+                    print(package.package_print_out(END_OF_DAY))
                 input('Press Enter to continue...')
             case '3':
                 search_time = input('\nEnter time to view status of all packages: (HH:MM) ')
                 search_time = convert_time(search_time)
-                package_list = [PACKAGES.search(i) for i in range(1, 41)]
-                for package in package_list:
-                    status = get_status_at_time(package, search_time)
-                    print(package.package_print_out(search_time) + ' -- ' + str(status))
+                for line in cache.fleet(search_time):
+                    print(line)
                 input('Press Enter to continue...')
             case '4':
                 print('Exiting...')
@@ -392,21 +377,47 @@ def user_interface(trucks: list[Truck]):
                 print('\nInvalid input. Please select and option by its #.')
 
 
+# Load the manifest, plan the day and index the chosen plan for lookups
+# Returns (trucks, packages, timeline), or None if no plan finished within the time budget
+def plan_day() -> tuple[list[Truck], PackageStore, PackageTimeline] | None:
+    instrumentation = Instrumentation(enabled=INSTRUMENT)
+    print('Loading data...')
+    with instrumentation.phase('load'):
+        dataset = DataLoader(cache_dir=SNAPSHOT_DIR, corrections=WGUPS_CORRECTIONS).load()
+
+    # Run independently seeded simulations in parallel until one is < 140 miles
+    print('Running simulation...')
+    with instrumentation.phase('planning'):
+        result = multi_start(run_simulation, dataset, PLANNER_SEEDS, PLANNER_WORKERS, PLANNER_TIME_BUDGET,
+                             DISTANCE_TARGET, INSTRUMENT, PROFILE)
+    if result is None:
+        print('No simulation finished within the time budget.')
+        return None
+    if result.distance >= DISTANCE_TARGET:
+        print(f'No simulation came in under {DISTANCE_TARGET} miles, using the shortest found.')
+    print('Simulation complete.')
+    print(f'Total distance traveled: {result.distance} miles')
+    print(format_violations(deadline_violations(result.trucks)))
+    if INSTRUMENT:
+        instrumentation.count('planner_runs', result.runs)
+        instrumentation.merge(result.report)
+        print(format_report(instrumentation.report()))
+
+    # collect the chosen plan's packages into a columnar store for lookups
+    trucks = result.trucks
+    packages = PackageStore.from_packages([package for truck in trucks for package in truck.delivered],
+                                          dataset.addresses)
+    # record every package's status transitions once so lookups are a bisect
+    timeline = PackageTimeline.from_packages(packages)
+    return trucks, packages, timeline
+
+
 def main():
     intro()  # Display intro message
-    # Run simulation until total distance is calculated < 140 miles
-    while True:
-        print('Running simulation...')
-        trucks = run_simulation()
-        distance = trucks[0].total_distance + trucks[1].total_distance + trucks[2].total_distance
-        if distance < 140:
-            print('Simulation complete.')
-            print(f'Total distance traveled: {distance} miles')
-            break
-        print('Total distance exceeded 140 miles.')
-        print('Rerunning simulation...')
-
-    user_interface(trucks)  # User Input Loop
+    plan = plan_day()
+    if plan is None:
+        exit()
+    user_interface(*plan)  # User Input Loop
     exit()  # Graceful exit
 
 
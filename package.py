@@ -5,6 +5,9 @@ from status import Status
 
 
 class Package:
+    __slots__ = ('ID', 'deadline', 'weight', 'note', 'is_priority', 'address', 'address_changes', 'leave_time',
+                 'truck', 'delivery_time', 'cancel_time')
+
     def __init__(self, ID, weight, note, is_priority=False) -> None:
         self.ID = ID
         self.deadline: int or str = None
@@ -13,9 +16,11 @@ class Package:
         self.is_priority = is_priority
 
         self.address: Address or None = None
+        self.address_changes = ()  # (time of change, previous Address) in time order
         self.leave_time = None  # added when truck leaves hub
         self.truck = None  # added when truck leaves hub
         self.delivery_time = None  # added when route is calculated
+        self.cancel_time = None  # set if the package is taken off its truck, it is never delivered then
 
     def __str__(self) -> str:
         return f'Package ID: {self.ID} - Weight: {self.weight} lbs - Deadline: {self.deadline}'
@@ -23,6 +28,20 @@ class Package:
     def get_address(self) -> str:
         return self.address.__str__()
 
+    # Replace the address from time on, the old one is kept for lookups before then
+    # A new tuple is built so shallow copies made for other simulation runs are not affected
+    def change_address(self, address, time) -> None:
+        self.address_changes = self.address_changes + ((time, self.address),)
+        self.address = address
+
+    # Address the package was listed with at time
+    def address_at(self, time):
+        address = self.address
+        for changed_at, previous in reversed(self.address_changes):
+            if time < changed_at:
+                address = previous
+        return address
+
     def handle_deadline(self):
         if self.deadline > datetime.timedelta(hours=10, minutes=30):
             return 'EOD'
@@ -32,9 +51,6 @@ class Package:
     def package_print_out(self, time):
         prtout = ''
         prtout += f'Package ID: {self.ID} - Weight: {self.weight} lbs - Leave Time: {self.leave_time} On Truck: {self.truck} - Deadline: {self.handle_deadline()} - '
-        if self.ID == 9 and time < datetime.timedelta(hours=10, minutes=20):
-            prtout += f'Council Hall - 300 State St Salt Lake City, UT 84103'
-        else:
-            prtout += f'{self.get_address()}'
+        prtout += f'{self.address_at(time)}'
 
         return prtout
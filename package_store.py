@@ -0,0 +1,232 @@
+import datetime
+
+import numpy as np
+
+from address import Address
+from package import Package
+from timeline import hub_arrival
+
+
+def _seconds(time) -> float:
+    return np.nan if time is None else time.total_seconds()
+
+
+def _timedelta(seconds) -> datetime.timedelta | None:
+    return None if np.isnan(seconds) else datetime.timedelta(seconds=float(seconds))
+
+
+# Address columns, few enough to keep as plain lists
+class AddressTable:
+    __slots__ = ('ids', 'name', 'street', 'city', 'state', 'zip', 'positions')
+
+    def __init__(self, addresses) -> None:
+        addresses = list(addresses)
+        self.ids = np.array([address.ID for address in addresses], dtype=np.int32)
+        self.name = [address.name for address in addresses]
+        self.street = [address.street for address in addresses]
+        self.city = [address.city for address in addresses]
+        self.state = [address.state for address in addresses]
+        self.zip = [address.zip for address in addresses]
+        self.positions = {address.ID: i for i, address in enumerate(addresses)}
+
+    def view(self, ID) -> 'AddressView':
+        return AddressView(self, self.positions[ID])
+
+
+# Read only Address backed by an AddressTable row
+class AddressView:
+    __slots__ = ('table', 'index')
+
+    __str__ = Address.__str__
+
+    def __init__(self, table, index) -> None:
+        self.table = table
+        self.index = index
+
+    @property
+    def ID(self):
+        return int(self.table.ids[self.index])
+
+    @property
+    def name(self):
+        return self.table.name[self.index]
+
+    @property
+    def street(self):
+        return self.table.street[self.index]
+
+    @property
+    def city(self):
+        return self.table.city[self.index]
+
+    @property
+    def state(self):
+        return self.table.state[self.index]
+
+    @property
+    def zip(self):
+        return self.table.zip[self.index]
+
+
+# Struct of arrays package store, one NumPy column per Package attribute
+# Times are float seconds since midnight with NaN for unset, truck 0 means unassigned
+# Rows are kept in package ID order so routing and status code can work on whole columns at once
+class PackageStore:
+    __slots__ = ('ids', 'weight', 'address_id', 'deadline', 'is_priority', 'truck', 'leave_time', 'delivery_time',
+                 'cancel_time', 'hub_arrival', 'notes', 'address_changes', 'addresses', 'versions', 'generation')
+
+    def __init__(self, size, addresses: AddressTable) -> None:
+        self.ids = np.zeros(size, dtype=np.int32)
+        self.weight = np.zeros(size, dtype=np.float32)
+        self.address_id = np.zeros(size, dtype=np.int32)
+        self.deadline = np.zeros(size, dtype=np.float64)
+        self.is_priority = np.zeros(size, dtype=bool)
+        self.truck = np.zeros(size, dtype=np.int16)
+        self.leave_time = np.full(size, np.nan)
+        self.delivery_time = np.full(size, np.nan)
+        self.cancel_time = np.full(size, np.nan)
+        self.hub_arrival = np.full(size, np.nan)  # only set for packages delayed on their way to the hub
+        self.notes = [''] * size
+        self.address_changes = [()] * size  # rarely set, so kept as a plain list
+        self.addresses = addresses
+        # bumped on every write to a row, and for the store as a whole, so caches can tell stale answers
+        self.versions = np.zeros(size, dtype=np.int64)
+        self.generation = 0
+
+    # Build a store from Package objects, such as the delivered packages of a finished simulation
+    @classmethod
+    def from_packages(cls, packages, addresses) -> 'PackageStore':
+        packages = sorted(packages, key=lambda package: package.ID)
+        store = cls(len(packages), AddressTable(addresses))
+        for i, package in enumerate(packages):
+            store.ids[i] = package.ID
+            store.weight[i] = float(package.weight)
+            store.hub_arrival[i] = _seconds(hub_arrival(package.note))
+            store.notes[i] = package.note
+            store._write(i, package)
+        return store
+
+    # Copy a package's plan dependent fields into its row, e.g. after it was rerouted
+    def update_from(self, package) -> None:
+        i = self.index_of(package.ID)
+        if i is None:
+            raise KeyError(package.ID)
+        self._write(i, package)
+
+    def touch(self, i) -> None:
+        self.versions[i] += 1
+        self.generation += 1
+
+    # Write version of a package's row, None if it is not stored
+    def version(self, ID) -> int | None:
+        i = self.index_of(ID)
+        return None if i is None else int(self.versions[i])
+
+    def _write(self, i, package) -> None:
+        self.touch(i)
+        self.address_id[i] = package.address.ID
+        self.address_changes[i] = tuple((time, previous.ID) for time, previous in package.address_changes)
+        self.deadline[i] = _seconds(package.deadline)
+        self.is_priority[i] = package.is_priority
+        self.truck[i] = package.truck or 0
+        self.leave_time[i] = _seconds(package.leave_time)
+        self.delivery_time[i] = _seconds(package.delivery_time)
+        self.cancel_time[i] = _seconds(package.cancel_time)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    # Make the store iterable, yields a view per package in ID order
+    def __iter__(self):
+        for i in range(len(self.ids)):
+            yield PackageView(self, i)
+
+    # row of a package ID, None if it is not stored, O(log N)
+    def index_of(self, ID) -> int | None:
+        i = int(np.searchsorted(self.ids, ID))
+        if i < len(self.ids) and self.ids[i] == ID:
+            return i
+        return None
+
+    # Same lookup as the package hash table, returns a view or None
+    def search(self, ID) -> 'PackageView | None':
+        i = self.index_of(int(ID))
+        return None if i is None else PackageView(self, i)
+
+
+# Package backed by a PackageStore row, reads and writes go straight to the columns
+# Reuses Package's printing so existing callers such as package_print_out keep working
+class PackageView:
+    __slots__ = ('store', 'index')
+
+    __str__ = Package.__str__
+    address_at = Package.address_at
+    get_address = Package.get_address
+    handle_deadline = Package.handle_deadline
+    package_print_out = Package.package_print_out
+
+    def __init__(self, store, index) -> None:
+        self.store = store
+        self.index = index
+
+    @property
+    def ID(self):
+        return int(self.store.ids[self.index])
+
+    @property
+    def weight(self):
+        weight = float(self.store.weight[self.index])
+        return int(weight) if weight.is_integer() else weight
+
+    @property
+    def note(self):
+        return self.store.notes[self.index]
+
+    @property
+    def is_priority(self):
+        return bool(self.store.is_priority[self.index])
+
+    @property
+    def deadline(self):
+        return _timedelta(self.store.deadline[self.index])
+
+    @property
+    def address(self):
+        return self.store.addresses.view(int(self.store.address_id[self.index]))
+
+    @property
+    def address_changes(self):
+        addresses = self.store.addresses
+        return tuple((time, addresses.view(ID)) for time, ID in self.store.address_changes[self.index])
+
+    @property
+    def truck(self):
+        truck = int(self.store.truck[self.index])
+        return truck or None
+
+    @truck.setter
+    def truck(self, value):
+        self.store.truck[self.index] = value or 0
+        self.store.touch(self.index)
+
+    @property
+    def leave_time(self):
+        return _timedelta(self.store.leave_time[self.index])
+
+    @leave_time.setter
+    def leave_time(self, value):
+        self.store.leave_time[self.index] = _seconds(value)
+        self.store.touch(self.index)
+
+    @property
+    def delivery_time(self):
+        return _timedelta(self.store.delivery_time[self.index])
+
+    @delivery_time.setter
+    def delivery_time(self, value):
+        self.store.delivery_time[self.index] = _seconds(value)
+        self.store.touch(self.index)
+
+    @property
+    def cancel_time(self):
+        return _timedelta(self.store.cancel_time[self.index])
@@ -0,0 +1,77 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from instrumentation import Instrumentation
+
+
+class PlanResult:
+    def __init__(self, seed, distance, trucks, report=None) -> None:
+        self.seed = seed
+        self.distance = distance
+        self.trucks = trucks
+        self.report = report  # instrumentation report of this run, if it was instrumented
+        self.runs = 1  # runs finished when multi_start returned this plan
+
+    def __str__(self) -> str:
+        return f'Seed: {self.seed} - Total distance: {self.distance} miles'
+
+
+# total miles driven by every truck in a plan
+def fleet_distance(trucks) -> float:
+    return sum(truck.total_distance for truck in trucks)
+
+
+# Dataset shared by every run in a worker process, sent once when the worker starts
+_worker_dataset = None
+
+
+def _init_worker(dataset) -> None:
+    global _worker_dataset
+    _worker_dataset = dataset
+
+
+# Worker entry point, simulate must be a module level function so it can be sent to the pool
+def _run_seed(simulate, seed, instrument, profile) -> PlanResult:
+    if not instrument:
+        trucks = simulate(_worker_dataset, seed=seed)
+        return PlanResult(seed, fleet_distance(trucks), trucks)
+    instrumentation = Instrumentation(profile=profile)
+    trucks = simulate(_worker_dataset, seed=seed, instrumentation=instrumentation)
+    return PlanResult(seed, fleet_distance(trucks), trucks, instrumentation.report())
+
+
+# Run simulate(dataset, seed=seed) for every seed across a process pool and keep the shortest plan
+# Returns as soon as a plan is under target or time_budget seconds have passed, None if nothing finished
+# With instrument, every run records an instrumentation report and the chosen plan carries its own
+def multi_start(simulate, dataset, seeds, workers=None, time_budget=None, target=None, instrument=False,
+                profile=False) -> PlanResult | None:
+    workers = workers or os.cpu_count() or 1
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+    best = None
+    runs = 0
+
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(dataset,))
+    try:
+        pending = {executor.submit(_run_seed, simulate, seed, instrument, profile) for seed in seeds}
+        while pending:
+            timeout = None if deadline is None else max(0.0, deadline - time.perf_counter())
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                break  # out of time
+
+            for future in done:
+                result = future.result()
+                runs += 1
+                if best is None or result.distance < best.distance:
+                    best = result
+
+            if target is not None and best is not None and best.distance < target:
+                break
+    finally:
+        # drop queued seeds, runs already in progress finish in the background
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if best is not None:
+        best.runs = runs
+    return best
@@ -0,0 +1,103 @@
+import datetime
+from collections import OrderedDict
+
+from package_store import PackageStore
+from timeline import PackageTimeline, package_line
+
+# Package lines kept, about a hundred lookup times for a full WGUPS day
+LINE_CAPACITY = 4096
+
+# Whole fleet printouts kept, one per lookup time
+SNAPSHOT_CAPACITY = 32
+
+_MISSING = object()
+
+
+# Least recently used cache whose entries carry the version of the data they were built from
+# An entry read back with a different version is stale, it is dropped and counted as an invalidation
+class LRUCache:
+    def __init__(self, capacity) -> None:
+        self.capacity = capacity
+        self._entries = OrderedDict()  # key -> (version, value), least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key, version, default=None):
+        entry = self._entries.get(key, _MISSING)
+        if entry is not _MISSING:
+            if entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            del self._entries[key]
+            self.invalidations += 1
+        self.misses += 1
+        return default
+
+    def put(self, key, version, value) -> None:
+        self._entries[key] = (version, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'capacity': self.capacity,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
+
+
+# Cached CLI lines for status lookups
+# A package's line is keyed on (package ID, timeline bucket), every time between two of its transitions
+# shares one entry, the fleet printout is keyed on the lookup time
+# Entries are checked against the store's row versions and the timeline's revisions, so a change of
+# address, truck or delivery time (e.g. by a Rerouter) makes the affected answers rebuild on their next lookup
+class StatusCache:
+    def __init__(self, packages: PackageStore, timeline: PackageTimeline, line_capacity=LINE_CAPACITY,
+                 snapshot_capacity=SNAPSHOT_CAPACITY) -> None:
+        self.packages = packages
+        self.timeline = timeline
+        self.lines = LRUCache(line_capacity)
+        self.snapshots = LRUCache(snapshot_capacity)
+
+    # Same text as timeline.package_line
+    def line(self, package, time: datetime.timedelta) -> str:
+        ID = package.ID
+        key = (ID, self.timeline.bucket(ID, time))
+        version = (self.packages.version(ID), self.timeline.revision(ID))
+        line = self.lines.get(key, version, _MISSING)
+        if line is _MISSING:
+            line = package_line(package, self.timeline, time)
+            self.lines.put(key, version, line)
+        return line
+
+    # Every package's line at time, in package ID order
+    def fleet(self, time: datetime.timedelta) -> tuple[str, ...]:
+        version = (self.packages.generation, self.timeline.generation)
+        lines = self.snapshots.get(time, version, _MISSING)
+        if lines is _MISSING:
+            lines = tuple(self.line(package, time) for package in self.packages)
+            self.snapshots.put(time, version, lines)
+        return lines
+
+    def clear(self) -> None:
+        self.lines.clear()
+        self.snapshots.clear()
+
+    def stats(self) -> dict:
+        return {'lines': self.lines.stats(), 'snapshots': self.snapshots.stats()}
@@ -0,0 +1,216 @@
+import math
+import random
+import time
+
+import numpy as np
+
+from route_optimizer import improve_route, route_length
+
+# Most packages a truck can carry
+TRUCK_CAPACITY = 16
+
+# Annealing moves tried per run when no time limit is given
+REBALANCE_ITERATIONS = 5000
+
+# Temperatures in miles, a move costing START_TEMPERATURE extra miles is accepted about a third of the time at first
+START_TEMPERATURE = 2.0
+END_TEMPERATURE = 0.01
+
+# Changes to a tour before it is tidied up with 2-opt / Or-opt
+REOPTIMIZE_AFTER = 8
+
+
+# Closed tour from the hub over the distinct addresses one truck visits, used to price moves
+# Removing or inserting an address is priced in O(n) on the tour without rebuilding it
+# Tidying up stops at the perf_counter deadline when one is given
+class _Tour:
+    def __init__(self, truck, distances, hub=0, deadline=None) -> None:
+        self.truck = truck
+        self.distances = distances
+        self.deadline = deadline
+        self.d = distances.distance
+        self.stops = {}  # address ID -> packages for it on this truck
+        for package in truck.priority_packages + truck.packages:
+            self.stops.setdefault(package.address.ID, []).append(package)
+        self.count = sum(len(packages) for packages in self.stops.values())
+
+        remaining = np.array(sorted(self.stops), dtype=np.intp)
+        tour = [hub]
+        while len(remaining) > 0:
+            nearest = int(np.argmin(distances.row(tour[-1])[remaining]))
+            tour.append(int(remaining[nearest]))
+            remaining = np.delete(remaining, nearest)
+        tour.append(hub)
+        self.tour = tour
+        self.changes = 0
+        self.tidy()
+
+    def tidy(self) -> None:
+        time_limit = None if self.deadline is None else max(self.deadline - time.perf_counter(), 0.0)
+        self.tour = improve_route(self.tour, self.distances, time_limit=time_limit)
+        self.length = route_length(self.tour, self.distances)
+        self.changes = 0
+
+    # Miles saved by no longer visiting address, negative
+    def removal_delta(self, address) -> float:
+        i = self.tour.index(address)
+        a = self.tour[i - 1]
+        b = self.tour[i + 1]
+        return self.d(a, b) - self.d(a, address) - self.d(address, b)
+
+    # Cheapest place to add address, as (extra miles, position to insert at)
+    def insertion(self, address) -> tuple[float, int]:
+        d = self.d
+        tour = self.tour
+        return min((d(tour[i], address) + d(address, tour[i + 1]) - d(tour[i], tour[i + 1]), i + 1)
+                   for i in range(len(tour) - 1))
+
+    # Extra miles for handing over packages, a group that empties an address removes the stop
+    def remove_delta(self, packages) -> float:
+        address = packages[0].address.ID
+        return self.removal_delta(address) if len(self.stops[address]) == len(packages) else 0.0
+
+    def add_delta(self, address) -> float:
+        return 0.0 if address in self.stops else self.insertion(address)[0]
+
+    def remove(self, packages) -> None:
+        address = packages[0].address.ID
+        if len(self.stops[address]) == len(packages):
+            self.length += self.removal_delta(address)
+            self.tour.remove(address)
+            del self.stops[address]
+            self.changes += 1
+        else:
+            self.stops[address] = [package for package in self.stops[address] if package not in packages]
+        self.count -= len(packages)
+
+    def add(self, packages) -> None:
+        address = packages[0].address.ID
+        if address not in self.stops:
+            delta, position = self.insertion(address)
+            self.tour.insert(position, address)
+            self.length += delta
+            self.stops[address] = []
+            self.changes += 1
+        self.stops[address].extend(packages)
+        self.count += len(packages)
+        if self.changes >= REOPTIMIZE_AFTER:
+            self.tidy()
+
+
+# Simulated annealing over which truck carries each package, run after sort_packages and before routing
+# Moves relocate one package, relocate every package a truck has for one address, or swap two packages
+# between trucks, each priced from removal and cheapest insertion deltas on per truck tours
+# allowed(package) lists the trucks a package may be on, moves never break it or TRUCK_CAPACITY
+# A truck loaded past capacity first hands packages to allowed trucks with room, cheapest first,
+# a ValueError is raised if it can not be brought under capacity that way
+# Runs for max_iterations moves, or until time_limit seconds have passed when one is given, and keeps
+# the best assignment seen, so stopping early still returns an improvement
+# time_limit also bounds the 2-opt / Or-opt passes that build and tidy the tours
+# Returns the estimated fleet miles before and after
+def rebalance_trucks(trucks, distances, allowed, rng=random, max_iterations=REBALANCE_ITERATIONS,
+                     time_limit=None, capacity=TRUCK_CAPACITY) -> tuple[float, float]:
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    packages = [package for truck in trucks for package in truck.priority_packages + truck.packages]
+    tours = {truck.ID: _Tour(truck, distances, deadline=deadline) for truck in trucks}
+    carrier = {package.ID: package.truck for package in packages}
+    options = {package.ID: [truck.ID for truck in allowed(package)] for package in packages}
+    movable = [package for package in packages if len(options[package.ID]) > 1]
+
+    start_miles = sum(tour.length for tour in tours.values())
+    for tour in tours.values():
+        while tour.count > capacity:
+            move = _cheapest_unload(tour, tours, options, capacity)
+            if move is None:
+                raise ValueError(f'Truck {tour.truck.ID} carries {tour.count} packages, more than {capacity}, '
+                                 f'and none of them can move to another truck with room')
+            package, target = move
+            tour.remove([package])
+            target.add([package])
+            carrier[package.ID] = target.truck.ID
+
+    current = best = sum(tour.length for tour in tours.values())
+    best_carrier = dict(carrier)
+    started = time.perf_counter()
+
+    iteration = 0
+    while movable:
+        if deadline is None:
+            if iteration >= max_iterations:
+                break
+            progress = iteration / max_iterations
+        else:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            progress = (now - started) / (deadline - started)
+        iteration += 1
+        temperature = START_TEMPERATURE * (END_TEMPERATURE / START_TEMPERATURE) ** progress
+
+        package = rng.choice(movable)
+        source = tours[carrier[package.ID]]
+        targets = [ID for ID in options[package.ID] if ID != source.truck.ID]
+        target = tours[rng.choice(targets)]
+        address = package.address.ID
+        draw = rng.random()
+
+        if draw < 0.3:
+            # swap with a package the target truck could hand back
+            candidates = [other for other in target.stops.get(rng.choice(list(target.stops)), ())
+                          if source.truck.ID in options[other.ID]] if target.stops else []
+            if not candidates:
+                continue
+            other = rng.choice(candidates)
+            if other.address.ID == address:
+                continue
+            delta = (source.remove_delta([package]) + source.add_delta(other.address.ID)
+                     + target.remove_delta([other]) + target.add_delta(address))
+            moves = ((source, target, [package]), (target, source, [other]))
+        else:
+            if draw < 0.65:
+                group = [package]
+            else:
+                group = [other for other in source.stops[address] if target.truck.ID in options[other.ID]]
+            if target.count + len(group) > capacity:
+                continue
+            delta = source.remove_delta(group) + target.add_delta(address)
+            moves = ((source, target, group),)
+
+        if delta > 0 and rng.random() >= math.exp(-delta / temperature):
+            continue
+        for giver, taker, group in moves:
+            giver.remove(group)
+            taker.add(group)
+            for moved in group:
+                carrier[moved.ID] = taker.truck.ID
+        current = sum(tour.length for tour in tours.values())
+        if current < best - 1e-9:
+            best = current
+            best_carrier = dict(carrier)
+
+    # load every truck with the best assignment found, keeping the packages' original order
+    by_id = {truck.ID: truck for truck in trucks}
+    for truck in trucks:
+        truck.priority_packages = []
+        truck.packages = []
+    for package in packages:
+        truck = by_id[best_carrier[package.ID]]
+        package.truck = truck.ID
+        (truck.priority_packages if package.is_priority else truck.packages).append(package)
+    return start_miles, best
+
+
+# Package on an overloaded tour that adds the fewest miles when moved to an allowed truck with room,
+# as (package, target tour), None if no package can move
+def _cheapest_unload(tour, tours, options, capacity):
+    best = None
+    for address, packages in tour.stops.items():
+        for package in packages:
+            for ID in options[package.ID]:
+                target = tours[ID]
+                if target is tour or target.count >= capacity:
+                    continue
+                delta = tour.remove_delta([package]) + target.add_delta(address)
+                if best is None or delta < best[0]:
+                    best = (delta, package, target)
+    return None if best is None else best[1:]
@@ -0,0 +1,162 @@
+import datetime
+
+import numpy as np
+
+from deadlines import meet_deadlines, stop_deadlines
+from events import DAY_START, DRIVER_COUNT, DeliverySimulation
+from route_optimizer import improve_route, nearest_neighbor
+from time_utils import TRUCK_SPEED, travel_time
+
+
+# Applies address, deadline and cancellation updates to a finished plan
+# Only the affected truck's route after its current position is rebuilt, the stops it has already
+# reached (or is driving to) stay as they are, and only packages still on board get new delivery times
+# The rebuilt part is checked against the remaining packages' deadlines from the time the truck gets there
+# Trucks still at the hub are dispatched again afterwards, a changed return moves the departures that wait on
+# its driver, see _redispatch
+# A timeline and package store, when given, are kept in step with every update
+class Rerouter:
+    def __init__(self, trucks, distances, addresses, timeline=None, store=None, max_iterations=1000,
+                 time_limit=None, candidates=None, drivers=DRIVER_COUNT) -> None:
+        self.trucks = trucks
+        self.distances = distances
+        self.addresses = addresses
+        self.timeline = timeline
+        self.store = store
+        self.drivers = drivers
+        self.max_iterations = max_iterations
+        self.time_limit = time_limit
+        self.candidates = candidates  # candidates.CandidateLists for the heuristics, optional
+        self.locations = {}  # package ID -> (truck, package)
+        for truck in trucks:
+            for package in truck.delivered:
+                self.locations[package.ID] = (truck, package)
+
+    def _locate(self, package_id, time):
+        if package_id not in self.locations:
+            raise KeyError(f'Package {package_id} is not on any truck')
+        truck, package = self.locations[package_id]
+        if package.delivery_time is not None and package.delivery_time <= time:
+            raise ValueError(f'Package {package_id} was already delivered at {package.delivery_time}')
+        return truck, package
+
+    # Send a package to a new street from time on
+    def change_address(self, package_id, street, time) -> list:
+        truck, package = self._locate(package_id, time)
+        address = self.addresses.find(street)
+        if address is None:
+            raise ValueError(f'Unknown street: {street}')
+        package.change_address(address, time)
+        return self._replan(truck, time)
+
+    def change_deadline(self, package_id, deadline, time) -> list:
+        truck, package = self._locate(package_id, time)
+        package.deadline = deadline
+        package.is_priority = deadline <= datetime.timedelta(hours=10, minutes=30)
+        return self._replan(truck, time)
+
+    # Take a package off its truck, it will not be delivered and shows as cancelled from time on
+    # A package cancelled before its truck leaves never goes out, so it loses its truck and leave time too
+    def cancel(self, package_id, time) -> list:
+        truck, package = self._locate(package_id, time)
+        truck.delivered.remove(package)
+        del self.locations[package_id]
+        package.delivery_time = None
+        package.cancel_time = time
+        if time < truck.leave_time:
+            package.leave_time = None
+            package.truck = None
+        if self.timeline is not None:
+            self.timeline.add(package)
+        if self.store is not None:
+            self.store.update_from(package)
+        return self._replan(truck, time)
+
+    # Rebuild truck's route from the first stop it has not yet reached at time, then redispatch the trucks
+    # that have not left yet
+    # Returns the packages whose delivery time was recalculated
+    def _replan(self, truck, time) -> list:
+        route = truck.route
+        travelled = np.concatenate(([0.0], np.cumsum(self.distances.route_legs(route))))
+
+        # a truck already on the road keeps driving to the stop it is heading for
+        fixed = 0
+        if time >= truck.leave_time:
+            elapsed = (time - truck.leave_time).total_seconds() / 3600
+            reached = int(np.searchsorted(travelled, elapsed * TRUCK_SPEED, side='right')) - 1
+            fixed = min(reached + 1, len(route) - 1)
+        start = route[fixed]
+        start_time = truck.leave_time + travel_time(float(travelled[fixed]))
+
+        pending = [package for package in truck.delivered
+                   if package.delivery_time is None or package.delivery_time > time]
+
+        # packages for the committed stop are handed over on arrival, the rest get a new route
+        arriving = [package for package in pending if package.address.ID == start and fixed > 0]
+        remaining = [package for package in pending if not (package.address.ID == start and fixed > 0)]
+        priority = [package for package in remaining if package.is_priority]
+        standard = [package for package in remaining if not package.is_priority]
+
+        tail = nearest_neighbor(start, priority, self.distances, self.candidates)
+        last_priority = len(tail) - 1
+        tail.extend(nearest_neighbor(tail[-1], standard, self.distances, self.candidates)[1:])
+        tail.append(0)
+        tail = improve_route(tail, self.distances, 0, last_priority, self.max_iterations, self.time_limit,
+                             self.candidates)
+        tail = improve_route(tail, self.distances, last_priority, len(tail) - 1, self.max_iterations,
+                             self.time_limit, self.candidates)
+        tail = meet_deadlines(tail, self.distances, start_time, stop_deadlines(remaining), self.max_iterations,
+                              self.time_limit)
+        truck.route = route[:fixed] + tail
+
+        # new delivery times for the rebuilt part of the route only
+        for package in arriving:
+            package.delivery_time = start_time
+        by_address = {}
+        for package in remaining:
+            by_address.setdefault(package.address.ID, []).append(package)
+        distance = float(travelled[fixed])
+        legs = self.distances.route_legs(tail)
+        for stop, leg in zip(tail[1:], legs):
+            distance += float(leg)
+            for package in by_address.pop(stop, ()):
+                package.delivery_time = truck.leave_time + travel_time(distance)
+        truck.total_distance = distance
+
+        changed = {package.ID: package for package in pending}
+        for package in self._redispatch(time):
+            changed[package.ID] = package
+        for package in changed.values():
+            if self.timeline is not None:
+                self.timeline.add(package)
+            if self.store is not None:
+                self.store.update_from(package)
+        return list(changed.values())
+
+    # Send the trucks still at the hub at time out again with the same simulation as the plan
+    # Each driver is free once the last truck they took out is back, so departures follow the updated returns
+    # Returns the packages on the redispatched trucks
+    def _redispatch(self, time) -> list:
+        waiting = [truck for truck in self.trucks if truck.leave_time > time]
+        if not waiting:
+            return []
+        free_at = [DAY_START] * self.drivers
+        for truck in self.trucks:
+            if truck.leave_time <= time and truck.driver is not None:
+                back = truck.leave_time + travel_time(truck.total_distance)
+                free_at[truck.driver - 1] = max(free_at[truck.driver - 1], back)
+
+        # unload the trucks so they can be loaded and sent out again
+        for truck in waiting:
+            truck.packages = truck.delivered + truck.packages
+            truck.total_distance = 0.0
+            truck.index_packages_by_address()
+        simulation = DeliverySimulation(waiting, self.distances, self.drivers, max(time, DAY_START),
+                                        prepare=self._schedule, free_at=free_at)
+        simulation.run()
+        return [package for truck in waiting for package in truck.delivered]
+
+    # Reorder a truck's route for its packages' deadlines from its new leave time
+    def _schedule(self, truck) -> None:
+        truck.route = meet_deadlines(truck.route, self.distances, truck.leave_time, stop_deadlines(truck.packages),
+                                     self.max_iterations, self.time_limit)
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import sqlite3
+import weakref
+
+import numpy as np
+
+from query_cache import LRUCache
+
+# Routes kept in memory per process
+ROUTE_CACHE_SIZE = 1024
+
+# Routes kept in an on-disk store, the oldest are dropped first
+DISK_CAPACITY = 100000
+
+# Seconds a process waits for another one writing the on-disk store
+DISK_TIMEOUT = 5.0
+
+# Bytes of a distance table hashed at a time
+FINGERPRINT_CHUNK = 1 << 20
+
+# Fingerprints already computed for a distance table
+_fingerprints = weakref.WeakKeyDictionary()
+
+
+# Hash of a distance table's values, routes cached for one table are never used with another
+# The table is hashed through a memoryview a chunk at a time, so a memory mapped table is read in place
+# rather than copied into the process
+def fingerprint(distances) -> str:
+    if distances not in _fingerprints:
+        data = distances.data
+        digest = hashlib.sha1(str(len(distances)).encode())
+        digest.update(data.dtype.str.encode())
+        if not data.flags.c_contiguous:
+            data = np.ascontiguousarray(data)
+        view = memoryview(data).cast('B')
+        for start in range(0, len(view), FINGERPRINT_CHUNK):
+            digest.update(view[start:start + FINGERPRINT_CHUNK])
+        _fingerprints[distances] = digest.hexdigest()
+    return _fingerprints[distances]
+
+
+# A planned route, its stops in order with the index of the last priority stop, and its miles
+class CachedRoute:
+    __slots__ = ('route', 'last_priority', 'length')
+
+    def __init__(self, route, last_priority, length) -> None:
+        self.route = tuple(route)
+        self.last_priority = last_priority
+        self.length = length
+
+
+# Memoized routes keyed on the start, the stop sets and the optimizer settings that produced them
+# Trucks with the same stops get the route computed for the first one without routing again
+# Lookups go to a bounded LRU in memory, then to an optional SQLite file at path, which several
+# processes, e.g. multi_start workers, can share
+class RouteCache:
+    def __init__(self, capacity=ROUTE_CACHE_SIZE, path=None, disk_capacity=DISK_CAPACITY) -> None:
+        self.memory = LRUCache(capacity)
+        self.path = path
+        self.disk_capacity = disk_capacity
+        self.disk_hits = 0
+        self._connection = None
+
+    # Cache key for a route from start over priority stops, then standard stops, on distances
+    # Both stop sets are kept whole, an address in both is visited on each leg by the heuristics
+    @staticmethod
+    def key(distances, start, priority, standard, settings) -> str:
+        stops = (sorted(frozenset(priority)), sorted(frozenset(standard)))
+        return json.dumps([fingerprint(distances), start, *stops, list(settings)])
+
+    def _disk(self):
+        if self._connection is None and self.path is not None:
+            self._connection = sqlite3.connect(self.path, timeout=DISK_TIMEOUT)
+            self._connection.execute('CREATE TABLE IF NOT EXISTS routes '
+                                     '(key TEXT PRIMARY KEY, route TEXT, last_priority INTEGER, length REAL)')
+        return self._connection
+
+    def get(self, key) -> CachedRoute | None:
+        cached = self.memory.get(key, None)
+        if cached is not None or self._disk() is None:
+            return cached
+        row = self._disk().execute('SELECT route, last_priority, length FROM routes WHERE key = ?',
+                                   (key,)).fetchone()
+        if row is None:
+            return None
+        self.disk_hits += 1
+        cached = CachedRoute(json.loads(row[0]), row[1], row[2])
+        self.memory.put(key, None, cached)
+        return cached
+
+    def put(self, key, route, last_priority, length) -> CachedRoute:
+        cached = CachedRoute(route, last_priority, length)
+        self.memory.put(key, None, cached)
+        disk = self._disk()
+        if disk is not None:
+            with disk:
+                disk.execute('INSERT OR REPLACE INTO routes VALUES (?, ?, ?, ?)',
+                             (key, json.dumps(list(cached.route)), last_priority, length))
+                disk.execute('DELETE FROM routes WHERE rowid <= (SELECT MAX(rowid) FROM routes) - ?',
+                             (self.disk_capacity,))
+        return cached
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def stats(self) -> dict:
+        return {**self.memory.stats(), 'disk_hits': self.disk_hits}
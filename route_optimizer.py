@@ -0,0 +1,158 @@
+import time
+
+import numpy as np
+
+# Smallest change in miles that counts as an improvement, guards against float noise
+EPSILON = 1e-9
+
+
+# total length of a route of address IDs
+def route_length(route, distances) -> float:
+    d = distances.distance
+    return sum(d(route[i], route[i + 1]) for i in range(len(route) - 1))
+
+
+# Nearest neighbor algorithm
+# O(N^2) time complexity, each step is a single vectorized row lookup
+# With candidates, each step checks the current address's nearest addresses first and only scans
+# every remaining stop once they have all been visited, close to O(N * k)
+# Consume a list of packages and return a route of addresses
+def nearest_neighbor(start, packages_list, distances, candidates=None):
+    if candidates is not None:
+        return _nearest_neighbor_candidates(start, packages_list, distances, candidates)
+    remaining = np.array([package.address.ID for package in packages_list], dtype=np.intp)
+    route = [start]
+    current = start
+    while len(remaining) > 0:
+        nearest = int(np.argmin(distances.row(current)[remaining]))
+        current = int(remaining[nearest])
+        route.append(current)
+        remaining = np.delete(remaining, nearest)
+    return route
+
+
+def _nearest_neighbor_candidates(start, packages_list, distances, candidates):
+    remaining = {}  # address ID -> packages still to visit there
+    for package in packages_list:
+        remaining[package.address.ID] = remaining.get(package.address.ID, 0) + 1
+    route = [start]
+    current = start
+    while remaining:
+        nearest = candidates.nearest(current, remaining)
+        if nearest is None:
+            addresses = np.fromiter(remaining, dtype=np.intp, count=len(remaining))
+            nearest = int(addresses[np.argmin(distances.row(current)[addresses])])
+        current = nearest
+        route.append(current)
+        remaining[current] -= 1
+        if remaining[current] == 0:
+            del remaining[current]
+    return route
+
+
+# Route positions from start to end for every address on that part of the route
+def _positions(route, start, end) -> dict:
+    positions = {}
+    for index in range(start, end + 1):
+        positions.setdefault(route[index], []).append(index)
+    return positions
+
+
+# Positions of the given addresses, shifted by offset
+def _candidate_positions(positions, addresses, offset=0) -> set[int]:
+    return {index + offset for address in addresses for index in positions.get(address, ())}
+
+
+# 2-opt: reverse route[i..j] if replacing edges (a, b) and (c, e) with (a, c) and (b, e) is shorter
+# Each move is scored in O(1) since the matrix is symmetric and the reversed section keeps its length
+# With candidates, only moves creating an edge between an address and one of its nearest addresses are tried
+def _two_opt_pass(route, d, start, end, candidates=None) -> bool:
+    positions = None if candidates is None else _positions(route, start, end)
+    for i in range(start + 1, end):
+        a = route[i - 1]
+        b = route[i]
+        ab = d(a, b)
+        if candidates is None:
+            others = range(i + 1, end)
+        else:
+            # c near a, or e near b, e sits just after c
+            others = sorted(_candidate_positions(positions, candidates[a])
+                            | _candidate_positions(positions, candidates[b], -1))
+        for j in others:
+            if not i < j < end:
+                continue
+            c = route[j]
+            e = route[j + 1]
+            delta = d(a, c) + d(b, e) - ab - d(c, e)
+            if delta < -EPSILON:
+                route[i:j + 1] = route[i:j + 1][::-1]
+                return True
+    return False
+
+
+# Or-opt: move a run of 1 to 3 stops, optionally reversed, between two other stops
+# Removal and insertion costs are both O(1) edge lookups
+# With candidates, a run is only tried next to the nearest addresses of its first or last stop
+def _or_opt_pass(route, d, start, end, candidates=None) -> bool:
+    positions = None if candidates is None else _positions(route, start, end)
+    for length in (1, 2, 3):
+        for i in range(start + 1, end - length + 1):
+            prev = route[i - 1]
+            first = route[i]
+            last = route[i + length - 1]
+            nxt = route[i + length]
+            removal = d(prev, first) + d(last, nxt) - d(prev, nxt)
+
+            if candidates is None:
+                edges = range(start, end)
+            else:
+                # the run's new neighbor is either route[k] or route[k + 1]
+                nearby = candidates[first] + candidates[last]
+                edges = sorted(_candidate_positions(positions, nearby) | _candidate_positions(positions, nearby, -1))
+            for k in edges:
+                if not start <= k < end or i - 1 <= k <= i + length - 1:
+                    continue  # edge touches the segment being moved
+                p = route[k]
+                q = route[k + 1]
+                pq = d(p, q)
+                forward = d(p, first) + d(last, q) - pq
+                backward = d(p, last) + d(first, q) - pq
+                insertion = min(forward, backward)
+                if insertion - removal < -EPSILON:
+                    segment = route[i:i + length]
+                    if backward < forward:
+                        segment.reverse()
+                    del route[i:i + length]
+                    position = k + 1 if k < i else k + 1 - length
+                    route[position:position] = segment
+                    return True
+    return False
+
+
+# Improve route with 2-opt and Or-opt moves, only stops strictly between route[start] and route[end] move
+# so the hub at both ends (and any other anchor) stays in place
+# With candidates (see candidates.CandidateLists) moves near each stop are tried first, the full
+# neighborhood is only scanned once every candidate move has stopped helping
+# Stops at a local optimum, after max_iterations accepted moves or once time_limit seconds have passed
+def improve_route(route, distances, start=0, end=None, max_iterations=1000, time_limit=None,
+                  candidates=None) -> list:
+    route = list(route)
+    if end is None:
+        end = len(route) - 1
+    if end - start < 3:
+        return route  # fewer than two movable stops
+
+    d = distances.distance
+    deadline = None if time_limit is None else time.perf_counter() + time_limit
+    iterations = 0
+    while iterations < max_iterations:
+        if deadline is not None and time.perf_counter() > deadline:
+            break
+        if candidates is not None and (_two_opt_pass(route, d, start, end, candidates)
+                                       or _or_opt_pass(route, d, start, end, candidates)):
+            iterations += 1
+            continue
+        if not (_two_opt_pass(route, d, start, end) or _or_opt_pass(route, d, start, end)):
+            break
+        iterations += 1
+    return route
@@ -0,0 +1,75 @@
+import csv
+import math
+import os
+import random
+
+# Deadline strings in packages.csv format and how often each is drawn
+DEFAULT_DEADLINE_MIX = {'9:00 AM': 0.05, '10:30 AM': 0.3, 'EOD': 0.65}
+
+DELAY_NOTE = 'Delayed on flight---will not arrive to depot until 9:05 am'
+STREET_NAMES = ('Main St', 'State St', 'Canyon Rd', 'Parkway Blvd', 'Lester St', 'Oakland Ave', 'Dalton Ave S',
+                'Taylorsville Blvd', 'Central Station Loop', 'Price Ave')
+
+# A hub and at least one delivery stop
+MIN_STOPS = 2
+
+
+# Seeded synthetic WGUPS scenario written as addresses.csv, distances.csv and packages.csv in the same
+# formats as the csv/ directory
+# Stops are random points on a square map, distances are Euclidean rounded up to a tenth of a mile,
+# rounding up keeps the triangle inequality so the table stays metric
+class ScenarioGenerator:
+    def __init__(self, stops, packages, trucks=3, seed=0, deadline_mix=None, delayed_share=0.1,
+                 truck_note_share=0.1, map_size=15.0) -> None:
+        if stops < MIN_STOPS:
+            raise ValueError(f'A scenario needs at least {MIN_STOPS} stops, got {stops}')
+        self.stops = stops
+        self.packages = packages
+        self.trucks = trucks
+        self.seed = seed
+        self.deadline_mix = DEFAULT_DEADLINE_MIX if deadline_mix is None else deadline_mix
+        self.delayed_share = delayed_share
+        self.truck_note_share = truck_note_share
+        self.map_size = map_size
+
+    def streets(self) -> list[str]:
+        return [f'{100 + i} {STREET_NAMES[i % len(STREET_NAMES)]}' for i in range(self.stops)]
+
+    # Write the three files into directory and return their paths as (addresses, packages, distances)
+    def write(self, directory) -> tuple[str, str, str]:
+        rng = random.Random(self.seed)
+        os.makedirs(directory, exist_ok=True)
+        addresses_path = os.path.join(directory, 'addresses.csv')
+        packages_path = os.path.join(directory, 'packages.csv')
+        distances_path = os.path.join(directory, 'distances.csv')
+        streets = self.streets()
+
+        with open(addresses_path, 'w', newline='') as address_file:
+            writer = csv.writer(address_file)
+            for i, street in enumerate(streets):
+                writer.writerow([i, 'Hub' if i == 0 else f'Stop {i}', street])
+
+        # one row at a time so large tables never sit in memory
+        points = [(rng.uniform(0, self.map_size), rng.uniform(0, self.map_size)) for _ in range(self.stops)]
+        with open(distances_path, 'w', newline='') as distance_file:
+            writer = csv.writer(distance_file)
+            for i, (x, y) in enumerate(points):
+                row = [f'{math.ceil(math.hypot(x - px, y - py) * 10) / 10:g}' for px, py in points[:i]]
+                writer.writerow(row + ['0'] + [''] * (self.stops - i - 1))
+
+        deadlines = list(self.deadline_mix)
+        weights = list(self.deadline_mix.values())
+        with open(packages_path, 'w', newline='') as package_file:
+            writer = csv.writer(package_file)
+            for ID in range(1, self.packages + 1):
+                note = ''
+                draw = rng.random()
+                if draw < self.delayed_share:
+                    note = DELAY_NOTE
+                elif draw < self.delayed_share + self.truck_note_share:
+                    note = f'Can only be on truck {rng.randint(1, self.trucks)}'
+                street = streets[rng.randrange(1, self.stops)]
+                deadline = rng.choices(deadlines, weights)[0]
+                writer.writerow([ID, street, 'Salt Lake City', 'UT', '84115', deadline, rng.randint(1, 90), note])
+
+        return addresses_path, packages_path, distances_path
@@ -0,0 +1,195 @@
+import argparse
+import asyncio
+import json
+import urllib.parse
+from http import HTTPStatus
+
+from main import END_OF_DAY, intro, plan_day
+from package_store import PackageStore
+from query_cache import StatusCache
+from time_utils import convert_time, travel_time
+from timeline import PackageTimeline
+from truck import Truck
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8950
+
+# Longest request head accepted, anything larger is refused
+MAX_HEADER_BYTES = 16384
+
+# Longest request body read and discarded on a kept alive connection, a larger one is answered and closed
+MAX_BODY_BYTES = 65536
+
+
+class QueryError(Exception):
+    def __init__(self, status: HTTPStatus, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+# Answers tracking queries for one planned day with the same lookups and text as the CLI
+class QueryService:
+    def __init__(self, trucks: list[Truck], packages: PackageStore, timeline: PackageTimeline) -> None:
+        self.trucks = trucks
+        self.packages = packages
+        self.timeline = timeline
+        self.cache = StatusCache(packages, timeline)
+
+    def _answer(self, package, time, line) -> dict:
+        return {
+            'id': package.ID,
+            'time': str(time),
+            'status': str(self.timeline.status_at(package.ID, time)),
+            'description': self.timeline.describe(package.ID, time),
+            'line': line,
+        }
+
+    # One package at time, menu 1
+    def package(self, package_id, time) -> dict:
+        package = self.packages.search(package_id)
+        if package is None:
+            raise QueryError(HTTPStatus.NOT_FOUND, f'Package {package_id} not found')
+        return self._answer(package, time, self.cache.line(package, time))
+
+    # Every package at time, menu 3
+    def all_packages(self, time) -> dict:
+        lines = self.cache.fleet(time)
+        return {'time': str(time),
+                'packages': [self._answer(package, time, line) for package, line in zip(self.packages, lines)]}
+
+    def truck_summaries(self) -> list[dict]:
+        return [{
+            'truck': truck.ID,
+            'leave_time': str(truck.leave_time),
+            'finish_time': str(truck.leave_time + travel_time(truck.total_distance)),
+            'miles': truck.total_distance,
+            'packages': sorted(package.ID for package in truck.delivered),
+            'route': list(truck.route),
+        } for truck in self.trucks]
+
+    # Route GET path?query to a lookup
+    #   /packages/<id>?time=HH:MM   one package
+    #   /packages?time=HH:MM        every package, end of day if time is left out
+    #   /trucks                     truck summaries
+    #   /cache                      status cache hit and miss counts
+    def route(self, target) -> dict | list:
+        url = urllib.parse.urlsplit(target)
+        query = urllib.parse.parse_qs(url.query)
+        parts = [part for part in url.path.split('/') if part]
+        if parts == ['trucks']:
+            return self.truck_summaries()
+        if parts == ['cache']:
+            return self.cache.stats()
+        if parts and parts[0] == 'packages' and len(parts) <= 2:
+            time = _parse_time(query.get('time', [None])[0])
+            if len(parts) == 1:
+                return self.all_packages(time)
+            try:
+                package_id = int(parts[1])
+            except ValueError:
+                raise QueryError(HTTPStatus.BAD_REQUEST, f'Bad package ID: {parts[1]}') from None
+            return self.package(package_id, time)
+        raise QueryError(HTTPStatus.NOT_FOUND, f'Unknown path: {url.path}')
+
+
+# HH:MM as typed into the CLI, with optional AM / PM
+def _parse_time(text):
+    if text is None:
+        return END_OF_DAY
+    try:
+        return convert_time(text)
+    except (ValueError, IndexError):
+        raise QueryError(HTTPStatus.BAD_REQUEST, f'Bad time: {text}') from None
+
+
+def _response(status: HTTPStatus, body, keep_alive) -> bytes:
+    payload = json.dumps(body).encode()
+    head = (f'HTTP/1.1 {status.value} {status.phrase}\r\n'
+            'Content-Type: application/json\r\n'
+            f'Content-Length: {len(payload)}\r\n'
+            f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n')
+    return head.encode() + payload
+
+
+# One coroutine per connection on a single event loop, so many clients share one thread
+# Connections stay open for further requests unless the client asks to close
+async def handle_connection(service: QueryService, reader, writer) -> None:
+    try:
+        while True:
+            try:
+                head = await reader.readuntil(b'\r\n\r\n')
+            except (asyncio.IncompleteReadError, ConnectionError):
+                break
+            except asyncio.LimitOverrunError:
+                writer.write(_response(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, {'error': 'Request too large'},
+                                       False))
+                break
+
+            lines = head.decode('latin-1').split('\r\n')
+            request = lines[0].split()
+            headers = {}
+            for line in lines[1:]:
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+            keep_alive = headers.get('connection', '').lower() != 'close' and request[-1:] == ['HTTP/1.1']
+
+            # no route reads a body, but it has to be skipped so the next request on the connection starts
+            # at its request line, bodies of unknown or too large length end the connection instead
+            length = headers.get('content-length', '0')
+            if 'transfer-encoding' in headers or not length.isdigit() or int(length) > MAX_BODY_BYTES:
+                keep_alive = False
+            elif int(length) > 0:
+                try:
+                    await reader.readexactly(int(length))
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+
+            if len(request) != 3:
+                status, body, keep_alive = HTTPStatus.BAD_REQUEST, {'error': 'Malformed request line'}, False
+            elif request[0] != 'GET':
+                status, body = HTTPStatus.METHOD_NOT_ALLOWED, {'error': f'{request[0]} not supported'}
+            else:
+                try:
+                    status, body = HTTPStatus.OK, service.route(request[1])
+                except QueryError as error:
+                    status, body = error.status, {'error': str(error)}
+
+            writer.write(_response(status, body, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+async def serve(service: QueryService, host=DEFAULT_HOST, port=DEFAULT_PORT) -> None:
+    server = await asyncio.start_server(lambda reader, writer: handle_connection(service, reader, writer),
+                                        host, port, limit=MAX_HEADER_BYTES)
+    addresses = ', '.join(str(sock.getsockname()) for sock in server.sockets)
+    print(f'Serving package lookups on {addresses}')
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve WGUPS package tracking lookups as JSON over HTTP.')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    intro()
+    plan = plan_day()
+    if plan is None:
+        exit()
+    try:
+        asyncio.run(serve(QueryService(*plan), args.host, args.port))
+    except KeyboardInterrupt:
+        print('Exiting...')
+
+
+if __name__ == '__main__':
+    main()
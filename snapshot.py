@@ -0,0 +1,115 @@
+import datetime
+import json
+import os
+
+import numpy as np
+
+from address import Address
+from address_registry import AddressRegistry
+from distance_matrix import DistanceMatrix
+from hash_table import HashTableWithChaining as HashTable
+from package import Package
+
+# Bump when the column layout changes so old snapshots are rebuilt
+SNAPSHOT_VERSION = 2
+
+ADDRESS_COLUMNS = ('id', 'name', 'street', 'city', 'state', 'zip')
+PACKAGE_COLUMNS = ('id', 'address_id', 'deadline', 'weight', 'note', 'is_priority')
+
+
+# Size and modification time of each source file, a change to either marks the snapshot stale
+def source_fingerprint(paths) -> dict:
+    fingerprint = {}
+    for path in paths:
+        stat = os.stat(path)
+        fingerprint[os.path.abspath(path)] = [stat.st_size, stat.st_mtime_ns]
+    return fingerprint
+
+
+def _column_path(cache_dir, table, column) -> str:
+    return os.path.join(cache_dir, f'{table}.{column}.npy')
+
+
+def _save(cache_dir, table, column, values) -> None:
+    # write then rename so a reader never sees a half written column
+    path = _column_path(cache_dir, table, column)
+    with open(path + '.tmp', 'wb') as column_file:
+        np.save(column_file, values)
+    os.replace(path + '.tmp', path)
+
+
+def _load(cache_dir, table, column) -> np.ndarray:
+    return np.load(_column_path(cache_dir, table, column), mmap_mode='r')
+
+
+def _text(value) -> str:
+    return '' if value is None else str(value)
+
+
+# Write addresses and packages as one .npy file per column and the distance matrix as raw float64
+# meta.json is written last, a snapshot without it is ignored
+def write_snapshot(cache_dir, dataset, sources) -> None:
+    os.makedirs(cache_dir, exist_ok=True)
+    meta_path = os.path.join(cache_dir, 'meta.json')
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    addresses = list(dataset.addresses)
+    _save(cache_dir, 'addresses', 'id', np.array([a.ID for a in addresses], dtype=np.int32))
+    for column in ADDRESS_COLUMNS[1:]:
+        _save(cache_dir, 'addresses', column, np.array([_text(getattr(a, column)) for a in addresses], dtype=str))
+
+    packages = [dataset.packages.search(i) for i in dataset.package_ids]
+    _save(cache_dir, 'packages', 'id', np.array([p.ID for p in packages], dtype=np.int32))
+    _save(cache_dir, 'packages', 'address_id', np.array([p.address.ID for p in packages], dtype=np.int32))
+    _save(cache_dir, 'packages', 'deadline',
+          np.array([p.deadline.total_seconds() for p in packages], dtype=np.int32))
+    _save(cache_dir, 'packages', 'weight', np.array([_text(p.weight) for p in packages], dtype=str))
+    _save(cache_dir, 'packages', 'note', np.array([_text(p.note) for p in packages], dtype=str))
+    _save(cache_dir, 'packages', 'is_priority', np.array([p.is_priority for p in packages], dtype=bool))
+
+    # packed distances already live in their own shared file
+    if isinstance(dataset.distances, DistanceMatrix):
+        _save(cache_dir, 'distances', 'matrix', dataset.distances.data)
+    elif os.path.exists(_column_path(cache_dir, 'distances', 'matrix')):
+        os.remove(_column_path(cache_dir, 'distances', 'matrix'))
+
+    with open(meta_path, 'w') as meta_file:
+        json.dump({'version': SNAPSHOT_VERSION, 'sources': source_fingerprint(sources)}, meta_file)
+
+
+# Load a snapshot, None if it is missing, from an older version or older than its sources
+# Returns the Dataset fields: addresses, packages, package_ids, distances (None if it was not stored)
+# Only the distance matrix is zero-copy, it stays memory mapped behind the DistanceMatrix
+# Address and Package objects are rebuilt from the mapped columns, since planning changes packages in place,
+# which skips CSV parsing and time conversion but still costs one object per row
+def read_snapshot(cache_dir, sources) -> tuple | None:
+    try:
+        with open(os.path.join(cache_dir, 'meta.json'), 'r') as meta_file:
+            meta = json.load(meta_file)
+        if meta.get('version') != SNAPSHOT_VERSION or meta.get('sources') != source_fingerprint(sources):
+            return None
+        address_columns = {column: _load(cache_dir, 'addresses', column) for column in ADDRESS_COLUMNS}
+        package_columns = {column: _load(cache_dir, 'packages', column) for column in PACKAGE_COLUMNS}
+        matrix_path = _column_path(cache_dir, 'distances', 'matrix')
+        matrix = np.load(matrix_path, mmap_mode='r') if os.path.exists(matrix_path) else None
+    except (OSError, ValueError):
+        return None
+
+    addresses = AddressRegistry()
+    for row in zip(*(address_columns[column].tolist() for column in ADDRESS_COLUMNS)):
+        address = Address(row[0], row[1], row[2])
+        if row[3]:
+            address.city, address.state, address.zip = row[3], row[4], row[5]
+        addresses.add(address)
+
+    packages = HashTable(10)
+    for ID, address_id, deadline, weight, note, is_priority in zip(
+            *(package_columns[column].tolist() for column in PACKAGE_COLUMNS)):
+        parcel = Package(ID, weight, note, is_priority)
+        parcel.address = addresses[address_id]
+        parcel.deadline = datetime.timedelta(seconds=deadline)
+        packages.insert(ID, parcel)
+
+    package_ids = tuple(package_columns['id'].tolist())
+    return addresses, packages, package_ids, None if matrix is None else DistanceMatrix(matrix)
@@ -16,6 +16,7 @@ class Status(Enum):
     OUT_FOR_DELIVERY = 'OUT_FOR_DELIVERY'
     DELIVERED = 'DELIVERED'
     DELAYED = 'DELAYED'
+    CANCELLED = 'CANCELLED'
 
     def __str__(self):
         return self.value
@@ -0,0 +1,49 @@
+import pytest
+
+from address import Address
+from address_registry import AddressRegistry, normalize_street
+
+
+@pytest.mark.parametrize('street, expected', [
+    ('5383 South 900 East #104', '5383 south 900 east'),
+    ('5383 S. 900 E., #104', '5383 s 900 e'),
+    ('10 Main St Apt 3', '10 main st'),
+    ('10 Main St Apartment #3', '10 main st'),
+    ('10 Main St Suite 200', '10 main st'),
+    ('10 Main St Unit B', '10 main st'),
+    ('10 Main St Rm 4-A', '10 main st'),
+])
+def test_unit_designators_are_stripped(street, expected):
+    assert normalize_street(street) == expected
+
+
+@pytest.mark.parametrize('street, expected', [
+    ('100 Unit St', '100 unit st'),
+    ('5 Suite Rd', '5 suite rd'),
+    ('300 Floor Ave', '300 floor ave'),
+    ('4 Rm Blvd', '4 rm blvd'),
+    ('10 Main St Unit', '10 main st unit'),
+    ('10 Main St #', '10 main st #'),
+    ('10 Stuart Unity', '10 stuart unity'),
+])
+def test_street_names_are_kept(street, expected):
+    assert normalize_street(street) == expected
+
+
+def test_streets_named_like_units_do_not_collide():
+    streets = ['100 Unit St', '100 Unit Rd', '5 Suite Rd', '300 Floor Ave', '4 Rm Blvd']
+    addresses = [Address(ID, f'Place {ID}', street) for ID, street in enumerate(streets)]
+    registry = AddressRegistry(addresses)
+
+    assert len(registry.by_street) == len(streets)
+    for address in addresses:
+        assert registry.find(address.street) is address
+
+
+def test_find_ignores_unit_and_punctuation():
+    address = Address(0, 'Hub', '5383 South 900 East')
+    registry = AddressRegistry([address])
+
+    assert registry.find('5383 South 900 East #104') is address
+    assert registry.find('5383 south 900 east, Suite 7') is address
+    assert registry.find('5383 South 900 East Unit St') is None
@@ -0,0 +1,22 @@
+import re
+
+from batch import ASSIGNERS, DEFAULT_ASSIGNER
+from dataset import DataLoader
+from main import run_simulation
+from scenario import ScenarioGenerator
+
+
+def test_generated_day_keeps_trucks_from_notes(tmp_path):
+    addresses, packages, distances = ScenarioGenerator(20, 40, seed=3, truck_note_share=0.4).write(tmp_path)
+    dataset = DataLoader(addresses, packages, distances).load()
+
+    trucks = run_simulation(dataset, seed=0, route_cache=False, assigner=ASSIGNERS[DEFAULT_ASSIGNER])
+
+    restricted = 0
+    for truck in trucks:
+        for package in truck.delivered:
+            match = re.search(r'truck (\d+)', package.note)
+            if match is not None:
+                restricted += 1
+                assert truck.ID == int(match.group(1)), package.ID
+    assert restricted > 0
@@ -0,0 +1,120 @@
+import datetime
+import random
+
+import numpy as np
+import pytest
+
+from deadlines import RouteSchedule, deadline_route, meet_deadlines
+from distance_matrix import DistanceMatrix
+
+LEAVE = datetime.timedelta(hours=8)
+
+
+def random_distances(size, seed):
+    rng = np.random.default_rng(seed)
+    points = rng.uniform(0, 10, (size, 2))
+    return DistanceMatrix(np.linalg.norm(points[:, np.newaxis] - points[np.newaxis, :], axis=2))
+
+
+def route_miles(route, distances):
+    return float(distances.route_legs(route).sum())
+
+
+# Deadlines a little after each stop's arrival on route, so route itself is on time with small slack
+def on_time_deadlines(route, distances, rng):
+    arrival = RouteSchedule(route, distances, LEAVE, {}).arrival
+    return {address: LEAVE + datetime.timedelta(seconds=arrival[i] - LEAVE.total_seconds() + rng.uniform(0, 1800))
+            for i, address in enumerate(route[1:-1], 1)}
+
+
+def assert_same_schedule(schedule, rebuilt):
+    assert np.allclose(schedule.arrival, rebuilt.arrival)
+    assert np.array_equal(schedule.due, rebuilt.due)
+    assert np.allclose(schedule.slack, rebuilt.slack)
+    assert np.allclose(schedule.forward, rebuilt.forward)
+    for first in range(len(schedule.route)):
+        for last in range(first, len(schedule.route)):
+            assert schedule.min_slack(first, last) == pytest.approx(rebuilt.min_slack(first, last))
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('repeat', [False, True])
+def test_move_and_swap_refresh_matches_rebuild(seed, repeat):
+    rng = random.Random(seed)
+    distances = random_distances(14, seed)
+    route = [0] + rng.sample(range(1, 14), 12) + [0]
+    if repeat:
+        route.insert(rng.randrange(1, len(route) - 1), route[3])
+    deadlines = {address: LEAVE + datetime.timedelta(minutes=rng.randint(10, 120)) for address in route[1:-1]}
+    schedule = RouteSchedule(route, distances, LEAVE, deadlines)
+
+    for _ in range(40):
+        p = rng.randrange(1, len(route) - 1)
+        if rng.random() < 0.5:
+            q = rng.choice([q for q in range(len(route) - 1) if q not in (p, p - 1)])
+            schedule.move(p, q)
+        else:
+            q = rng.randrange(1, len(route) - 1)
+            if q == p:
+                continue
+            schedule.swap(min(p, q), max(p, q))
+        assert_same_schedule(schedule, RouteSchedule(list(schedule.route), distances, LEAVE, deadlines))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_move_and_swap_costs_match_applied_moves(seed):
+    rng = random.Random(seed)
+    distances = random_distances(12, seed)
+    route = [0] + rng.sample(range(1, 12), 11) + [0]
+    deadlines = on_time_deadlines(route, distances, rng)
+    schedule = RouteSchedule(route, distances, LEAVE, deadlines)
+    assert schedule.feasible()
+    last = len(route) - 1
+
+    for p in range(1, last):
+        for q in range(last):
+            if q in (p, p - 1):
+                continue
+            moved = RouteSchedule(list(route), distances, LEAVE, deadlines)
+            moved.move(p, q)
+            cost = schedule.move_cost(p, q)
+            if cost is None:
+                assert not moved.feasible()
+            else:
+                assert moved.feasible()
+                assert cost == pytest.approx(route_miles(moved.route, distances) - route_miles(route, distances))
+        for q in range(p + 1, last):
+            swapped = RouteSchedule(list(route), distances, LEAVE, deadlines)
+            swapped.swap(p, q)
+            cost = schedule.swap_cost(p, q)
+            if cost is None:
+                assert not swapped.feasible()
+            else:
+                assert swapped.feasible()
+                assert cost == pytest.approx(route_miles(swapped.route, distances) - route_miles(route, distances))
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_meet_deadlines_keeps_on_time_routes_on_time(seed):
+    rng = random.Random(seed)
+    distances = random_distances(12, seed)
+    route = [0] + rng.sample(range(1, 12), 11) + [0]
+    deadlines = on_time_deadlines(route, distances, rng)
+
+    improved = meet_deadlines(list(route), distances, LEAVE, deadlines)
+
+    assert sorted(improved) == sorted(route)
+    assert RouteSchedule(improved, distances, LEAVE, deadlines).feasible()
+    assert route_miles(improved, distances) <= route_miles(route, distances) + 1e-9
+
+
+def test_deadline_route_visits_tightest_stop_first_when_it_must():
+    distances = random_distances(8, 0)
+    far = max(range(1, 8), key=lambda address: distances.distance(0, address))
+    deadlines = {far: LEAVE + datetime.timedelta(seconds=distances.distance(0, far) * 200 + 1)}
+
+    route = deadline_route(0, range(1, 8), distances, LEAVE, deadlines)
+
+    assert route[0] == 0 and route[-1] == 0 and sorted(route[1:-1]) == list(range(1, 8))
+    assert route[1] == far
+    assert RouteSchedule(route, distances, LEAVE, deadlines).feasible()
@@ -0,0 +1,112 @@
+import datetime
+
+import numpy as np
+
+from address import Address
+from distance_matrix import DistanceMatrix
+from events import DAY_START, DeliverySimulation
+from package import Package
+from time_utils import travel_time
+from truck import Truck
+
+DELAY_NOTE = 'Delayed on flight---will not arrive to depot until 9:05 am'
+
+# hub and four stops on a line, one mile apart
+DISTANCES = DistanceMatrix(np.abs(np.subtract.outer(np.arange(5.0), np.arange(5.0))))
+ADDRESSES = [Address(ID, f'Stop {ID}', f'{ID} Main St') for ID in range(5)]
+
+
+def clock(hours, minutes=0):
+    return datetime.timedelta(hours=hours, minutes=minutes)
+
+
+def make_package(ID, address, note=''):
+    package = Package(ID, 1, note)
+    package.deadline = clock(22)
+    package.address = ADDRESSES[address]
+    return package
+
+
+def make_truck(ID, packages):
+    truck = Truck(ID, ADDRESSES[0])
+    truck.packages = packages
+    truck.route = [0] + sorted({package.address.ID for package in packages}) + [0]
+    truck.index_packages_by_address()
+    return truck
+
+
+def back_at_hub(truck):
+    return truck.leave_time + travel_time(truck.total_distance)
+
+
+def test_trucks_leave_at_day_start_and_deliver_along_route():
+    truck = make_truck(1, [make_package(1, 2), make_package(2, 4), make_package(3, 2)])
+
+    DeliverySimulation([truck], DISTANCES).run()
+
+    assert truck.leave_time == DAY_START
+    assert truck.total_distance == 8.0
+    assert sorted(package.ID for package in truck.delivered) == [1, 2, 3]
+    for package in truck.delivered:
+        assert package.leave_time == DAY_START
+        assert package.delivery_time == DAY_START + travel_time(package.address.ID)
+
+
+def test_delayed_package_holds_only_its_truck():
+    delayed = make_truck(1, [make_package(1, 1), make_package(2, 3, DELAY_NOTE)])
+    ready = make_truck(2, [make_package(3, 2)])
+
+    DeliverySimulation([delayed, ready], DISTANCES).run()
+
+    assert delayed.leave_time == clock(9, 5)
+    assert ready.leave_time == DAY_START
+
+
+def test_address_correction_holds_truck_until_known():
+    corrected = make_package(1, 1)
+    corrected.change_address(ADDRESSES[3], clock(10, 20))
+    truck = make_truck(1, [corrected, make_package(2, 2)])
+
+    DeliverySimulation([truck], DISTANCES).run()
+
+    assert truck.leave_time == clock(10, 20)
+    assert corrected.delivery_time == clock(10, 20) + travel_time(3)
+
+
+def test_third_truck_waits_for_first_driver_back():
+    short = make_truck(1, [make_package(1, 1)])
+    long = make_truck(2, [make_package(2, 4)])
+    last = make_truck(3, [make_package(3, 2)])
+
+    simulation = DeliverySimulation([short, long, last], DISTANCES, drivers=2, record=True)
+    simulation.run()
+
+    assert short.leave_time == long.leave_time == DAY_START
+    assert last.leave_time == back_at_hub(short)
+    assert last.driver == short.driver != long.driver
+    # events are handled in time order, and in Event order at the same time
+    assert simulation.log == sorted(simulation.log, key=lambda entry: (entry[0], entry[1]))
+
+
+def test_free_at_delays_drivers_still_out():
+    truck = make_truck(1, [make_package(1, 1)])
+
+    DeliverySimulation([truck], DISTANCES, drivers=2, free_at=[clock(9), clock(8, 30)]).run()
+
+    assert truck.leave_time == clock(8, 30)
+    assert truck.driver == 2
+
+
+def test_prepare_sees_leave_time_and_may_reorder_route():
+    truck = make_truck(1, [make_package(1, 1), make_package(2, 4, DELAY_NOTE)])
+    seen = []
+
+    def prepare(truck):
+        seen.append(truck.leave_time)
+        truck.route = [0, 4, 1, 0]
+
+    DeliverySimulation([truck], DISTANCES, prepare=prepare).run()
+
+    assert seen == [clock(9, 5)]
+    assert [package.ID for package in truck.delivered] == [2, 1]
+    assert truck.total_distance == 8.0
@@ -0,0 +1,91 @@
+import datetime
+
+import pytest
+
+from batch_status import day_ticks
+from dataset import WGUPS_CORRECTIONS, DataLoader
+from main import run_simulation
+from package_store import PackageStore
+from query_cache import LRUCache, StatusCache
+from rerouting import Rerouter
+from timeline import PackageTimeline, package_line
+
+
+@pytest.fixture
+def plan():
+    dataset = DataLoader(corrections=WGUPS_CORRECTIONS).load()
+    trucks = run_simulation(dataset, seed=0, route_cache=False)
+    packages = [package for truck in trucks for package in truck.delivered]
+    store = PackageStore.from_packages(packages, dataset.addresses)
+    timeline = PackageTimeline.from_packages(store)
+    rerouter = Rerouter(trucks, dataset.distances, dataset.addresses, timeline, store)
+    return trucks, store, timeline, rerouter
+
+
+def times(step=datetime.timedelta(minutes=5)):
+    return [datetime.timedelta(seconds=float(tick)) for tick in day_ticks(step=step)]
+
+
+def test_lru_evicts_least_recently_used_and_drops_stale_versions():
+    cache = LRUCache(2)
+    cache.put('a', 1, 'A')
+    cache.put('b', 1, 'B')
+    assert cache.get('a', 1) == 'A'
+    cache.put('c', 1, 'C')
+
+    assert cache.get('b', 1) is None
+    assert cache.get('c', 1) == 'C'
+    assert cache.get('a', 2) is None
+    assert len(cache) == 1
+    assert cache.stats() == {'size': 1, 'capacity': 2, 'hits': 2, 'misses': 2, 'hit_rate': 0.5,
+                             'evictions': 1, 'invalidations': 1}
+
+
+def test_cached_lines_match_uncached(plan):
+    _, store, timeline, _ = plan
+    cache = StatusCache(store, timeline)
+
+    for _ in range(2):
+        for time in times():
+            for package in store:
+                assert cache.line(package, time) == package_line(package, timeline, time)
+    assert cache.lines.hits > cache.lines.misses
+
+
+def test_reroute_invalidates_affected_lines_and_fleet(plan):
+    trucks, store, timeline, rerouter = plan
+    cache = StatusCache(store, timeline)
+    # fewer lookup times than SNAPSHOT_CAPACITY, so no printout is evicted
+    lookups = times(datetime.timedelta(minutes=30))
+    for time in lookups:
+        cache.fleet(time)
+    truck = trucks[1]
+    ID = max(truck.delivered, key=lambda package: package.delivery_time).ID
+    street = trucks[0].delivered[0].address.street
+    change = truck.leave_time + datetime.timedelta(minutes=30)
+    hits = cache.lines.hits
+
+    rerouter.change_address(ID, street, change)
+
+    for time in lookups:
+        assert cache.fleet(time) == tuple(package_line(package, timeline, time) for package in store)
+    assert cache.snapshots.invalidations == len(lookups)
+    assert cache.lines.invalidations > 0
+    # lines of packages the reroute did not touch are still served from the cache
+    assert cache.lines.hits > hits
+
+
+def test_cancel_invalidates_the_cancelled_line(plan):
+    trucks, store, timeline, rerouter = plan
+    cache = StatusCache(store, timeline)
+    truck = trucks[1]
+    package = store.search(max(truck.delivered, key=lambda package: package.delivery_time).ID)
+    late = package.delivery_time
+    before = cache.line(package, late)
+
+    rerouter.cancel(package.ID, truck.leave_time + datetime.timedelta(minutes=30))
+
+    after = cache.line(package, late)
+    assert after != before
+    assert after == package_line(package, timeline, late)
+    assert after.endswith('-- CANCELLED')
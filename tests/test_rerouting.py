@@ -0,0 +1,144 @@
+import datetime
+
+import pytest
+
+from batch_status import STATUS_CODES, day_ticks, status_matrix
+from dataset import WGUPS_CORRECTIONS, DataLoader
+from main import run_simulation
+from package_store import PackageStore
+from rerouting import Rerouter
+from status import Status
+from time_utils import travel_time
+from timeline import PackageTimeline
+
+
+@pytest.fixture
+def plan():
+    dataset = DataLoader(corrections=WGUPS_CORRECTIONS).load()
+    trucks = run_simulation(dataset, seed=0, route_cache=False)
+    packages = [package for truck in trucks for package in truck.delivered]
+    store = PackageStore.from_packages(packages, dataset.addresses)
+    timeline = PackageTimeline.from_packages(packages)
+    rerouter = Rerouter(trucks, dataset.distances, dataset.addresses, timeline, store)
+    return trucks, store, timeline, rerouter
+
+
+def minutes(hours, minutes=0):
+    return datetime.timedelta(hours=hours, minutes=minutes)
+
+
+def assert_timeline_matches_matrix(store, timeline, ID):
+    ticks = day_ticks()
+    row = status_matrix(store, [ID], ticks)[0]
+    for tick, code in zip(ticks, row):
+        assert timeline.status_at(ID, datetime.timedelta(seconds=float(tick))) is STATUS_CODES[code], tick
+
+
+def back_at_hub(truck):
+    return truck.leave_time + travel_time(truck.total_distance)
+
+
+# No driver has two trucks out at once and every package left with its truck
+def assert_dispatch_consistent(trucks, store):
+    for driver in {truck.driver for truck in trucks}:
+        trips = sorted((truck.leave_time, back_at_hub(truck)) for truck in trucks if truck.driver == driver)
+        for (_, back), (leave, _) in zip(trips, trips[1:]):
+            assert leave >= back
+    for truck in trucks:
+        for package in truck.delivered:
+            assert package.leave_time == truck.leave_time
+            assert truck.leave_time <= package.delivery_time <= back_at_hub(truck)
+            assert store.search(package.ID).leave_time == truck.leave_time
+
+
+def test_longer_route_delays_departure_waiting_on_its_driver(plan):
+    trucks, store, timeline, rerouter = plan
+    first, second, last = sorted(trucks, key=lambda truck: truck.leave_time)
+    far = max(rerouter.addresses, key=lambda address: rerouter.distances.distance(0, address.ID))
+    package = max(first.delivered, key=lambda package: package.delivery_time)
+    time = first.leave_time + minutes(1, 50)
+    planned = last.leave_time
+
+    changed = rerouter.change_address(package.ID, far.street, time)
+
+    assert last.leave_time > planned
+    assert last.leave_time == min(back_at_hub(first), back_at_hub(second))
+    assert {package.ID for package in last.delivered} <= {package.ID for package in changed}
+    assert_dispatch_consistent(trucks, store)
+    for package in last.delivered:
+        assert timeline.status_at(package.ID, last.leave_time) is Status.OUT_FOR_DELIVERY
+
+
+def test_reroute_before_departure_reschedules_truck(plan):
+    trucks, store, timeline, rerouter = plan
+    truck = max(trucks, key=lambda truck: truck.leave_time)
+    package = truck.delivered[-1]
+    street = trucks[0].delivered[0].address.street
+    time = truck.leave_time - minutes(0, 30)
+
+    rerouter.change_address(package.ID, street, time)
+
+    assert package.address.street == street
+    assert truck.route[0] == 0 and truck.route[-1] == 0
+    assert package.address.ID in truck.route
+    assert_dispatch_consistent(trucks, store)
+    assert timeline.status_at(package.ID, package.delivery_time) is Status.DELIVERED
+
+
+def test_cancel_before_departure_never_goes_out(plan):
+    trucks, store, timeline, rerouter = plan
+    truck = max(trucks, key=lambda truck: truck.leave_time)
+    package = truck.delivered[0]
+    time = truck.leave_time - minutes(0, 30)
+
+    rerouter.cancel(package.ID, time)
+
+    assert package.truck is None and package.leave_time is None and package.delivery_time is None
+    assert package not in truck.delivered
+    assert [status for _, status, _ in timeline.events(package.ID)][-1] is Status.CANCELLED
+    assert Status.OUT_FOR_DELIVERY not in [status for _, status, _ in timeline.events(package.ID)]
+    assert timeline.status_at(package.ID, truck.leave_time + minutes(0, 5)) is Status.CANCELLED
+    assert_timeline_matches_matrix(store, timeline, package.ID)
+
+
+def test_cancel_on_the_road_keeps_truck(plan):
+    trucks, store, timeline, rerouter = plan
+    truck = trucks[1]
+    package = max(truck.delivered, key=lambda package: package.delivery_time)
+    time = truck.leave_time + minutes(0, 30)
+    delivery = package.delivery_time
+
+    rerouter.cancel(package.ID, time)
+
+    assert package.truck == truck.ID and package.leave_time == truck.leave_time
+    assert package.delivery_time is None
+    assert timeline.status_at(package.ID, time - minutes(0, 1)) is Status.OUT_FOR_DELIVERY
+    assert timeline.status_at(package.ID, delivery) is Status.CANCELLED
+    assert_timeline_matches_matrix(store, timeline, package.ID)
+
+
+def test_delivered_package_cannot_be_cancelled(plan):
+    trucks, _, _, rerouter = plan
+    package = min(trucks[1].delivered, key=lambda package: package.delivery_time)
+
+    with pytest.raises(ValueError):
+        rerouter.cancel(package.ID, package.delivery_time)
+
+
+def test_reroute_on_the_road_keeps_stops_already_reached(plan):
+    trucks, store, timeline, rerouter = plan
+    truck = trucks[1]
+    route = list(truck.route)
+    time = truck.leave_time + minutes(0, 45)
+    done = [package for package in truck.delivered if package.delivery_time <= time]
+    times = {package.ID: package.delivery_time for package in done}
+    package = max(truck.delivered, key=lambda package: package.delivery_time)
+
+    rerouter.change_deadline(package.ID, minutes(9, 15), time)
+
+    assert done
+    reached = max(route.index(package.address.ID) for package in done)
+    assert truck.route[:reached + 1] == route[:reached + 1]
+    assert all(package.delivery_time == times[package.ID] for package in done)
+    assert package.delivery_time <= minutes(9, 15)
+    assert_dispatch_consistent(trucks, store)
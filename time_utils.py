@@ -0,0 +1,23 @@
+import datetime
+
+
+# Convert time string to minutes
+# "10:30 AM" -> 10:30 , "10:30 PM"-> 22:30
+def convert_time(time_str) -> datetime.timedelta:
+    if time_str == 'EOD':
+        return datetime.timedelta(hours=22, minutes=0)
+    time = time_str.split(':')
+    hour = int(time[0])
+    minute = int(time[1].split(' ')[0])
+    if len(time[1]) > 2 and time[1].split(' ')[1] == 'PM':
+        hour += 12
+    return datetime.timedelta(hours=hour, minutes=minute)
+
+
+# Truck speed used for every leg
+TRUCK_SPEED = 18  # miles per hour
+
+
+# Time to drive a distance at TRUCK_SPEED
+def travel_time(miles) -> datetime.timedelta:
+    return datetime.timedelta(minutes=miles / TRUCK_SPEED * 60)
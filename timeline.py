@@ -0,0 +1,116 @@
+import bisect
+import datetime
+import re
+
+from status import Status
+from time_utils import convert_time
+
+# "Delayed on flight---will not arrive to depot until 9:05 am"
+_DELAY_NOTE = re.compile(r'until (\d{1,2}:\d{2} [ap]m)', re.IGNORECASE)
+
+START_OF_DAY = datetime.timedelta(0)
+
+
+# Time a delayed package reaches the hub according to its note, None if it is not delayed
+def hub_arrival(note) -> datetime.timedelta | None:
+    match = _DELAY_NOTE.search(note or '')
+    if match is None:
+        return None
+    return convert_time(match.group(1).upper())
+
+
+# Sorted (time, status, description) transitions for every package, built once after run_simulation
+# A status lookup is a bisect over one package's transition times, O(log k)
+class PackageTimeline:
+    def __init__(self) -> None:
+        self._events: dict[int, list[tuple[datetime.timedelta, Status, str]]] = {}
+        self._times: dict[int, list[float]] = {}
+        self._delivery: dict[int, datetime.timedelta | None] = {}
+        # bumped whenever a package's transitions are replaced, and for the timeline as a whole
+        self._revisions: dict[int, int] = {}
+        self.generation = 0
+
+    @classmethod
+    def from_packages(cls, packages) -> 'PackageTimeline':
+        timeline = cls()
+        for package in packages:
+            timeline.add(package)
+        return timeline
+
+    # Record a package's transitions, replacing any it already had
+    def add(self, package) -> None:
+        leave = package.leave_time
+        delivery = package.delivery_time
+        arrival = hub_arrival(package.note)
+
+        events = []
+        if arrival is None:
+            events.append((START_OF_DAY, Status.AT_HUB, 'at hub'))
+        else:
+            events.append((START_OF_DAY, Status.DELAYED, 'delayed'))
+            # a package already loaded counts as arrived when its truck left
+            arrived = arrival if leave is None else min(arrival, leave)
+            events.append((arrived, Status.AT_HUB, 'arrived at hub'))
+
+        # status is filled in below, a correction does not change where the package is
+        for changed_at, _ in package.address_changes:
+            events.append((changed_at, None, f'address corrected to {package.address_at(changed_at)}'))
+
+        if leave is not None:
+            events.append((leave, Status.OUT_FOR_DELIVERY, f'out for delivery on truck {package.truck}'))
+            if delivery is not None:
+                events.append((delivery, Status.DELIVERED, 'delivered'))
+        # a cancelled package is taken off its truck and goes back to the hub, it is never delivered
+        if package.cancel_time is not None:
+            events.append((package.cancel_time, Status.CANCELLED, 'cancelled, returned to hub'))
+
+        # stable sort keeps the logical order for transitions at the same time
+        events.sort(key=lambda event: event[0])
+        # nothing happens to a package once it is cancelled
+        if package.cancel_time is not None:
+            events = [event for event in events if event[0] <= package.cancel_time]
+        for i, (time, status, description) in enumerate(events):
+            if status is None:
+                events[i] = (time, events[i - 1][1], description)
+        self._events[package.ID] = events
+        self._times[package.ID] = [event[0].total_seconds() for event in events]
+        self._delivery[package.ID] = delivery
+        self._revisions[package.ID] = self._revisions.get(package.ID, 0) + 1
+        self.generation += 1
+
+    def __contains__(self, ID) -> bool:
+        return ID in self._events
+
+    def events(self, ID) -> list[tuple[datetime.timedelta, Status, str]]:
+        return list(self._events.get(ID, ()))
+
+    def revision(self, ID) -> int:
+        return self._revisions.get(ID, 0)
+
+    # Index of the last transition at or before time, nothing about a package changes between transitions
+    # so every time with the same bucket gets the same answer, -1 for unknown packages
+    def bucket(self, ID, time: datetime.timedelta) -> int:
+        times = self._times.get(ID)
+        if times is None:
+            return -1
+        return max(bisect.bisect_right(times, time.total_seconds()) - 1, 0)
+
+    # Status of a package at time, None for unknown packages
+    def status_at(self, ID, time: datetime.timedelta) -> Status | None:
+        times = self._times.get(ID)
+        if times is None:
+            return None
+        i = bisect.bisect_right(times, time.total_seconds()) - 1
+        return self._events[ID][max(i, 0)][1]
+
+    # Status text shown in the CLI, delivered packages include their delivery time
+    def describe(self, ID, time: datetime.timedelta) -> str:
+        status = self.status_at(ID, time)
+        if status is Status.DELIVERED:
+            return f'{status} at {self._delivery[ID]}'
+        return str(status)
+
+
+# One package's line as the CLI prints it for a lookup at time
+def package_line(package, timeline: PackageTimeline, time: datetime.timedelta) -> str:
+    return package.package_print_out(time) + ' -- ' + timeline.describe(package.ID, time)
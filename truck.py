@@ -1,18 +1,23 @@
-from typing import List
+from typing import Dict, List
 
 from package import Package
 
 
 class Truck:
+    __slots__ = ('delivered', 'ID', 'packages', 'priority_packages', 'packages_by_address', 'route', 'location',
+                 'leave_time', 'total_distance', 'driver')
+
     def __init__(self, ID, location) -> None:
         self.delivered = None
         self.ID = ID  # Truck ID
         self.packages: List[Package] = []
         self.priority_packages: List[Package] = []
+        self.packages_by_address: Dict[int, List[Package]] = {}
         self.route = []
         self.location = location
         self.leave_time = None
         self.total_distance = 0.0
+        self.driver = None  # ID of the driver who took the truck out
 
     def __str__(self) -> str:
         string_builder = ""
@@ -35,3 +40,10 @@ class Truck:
             package.leave_time = self.leave_time
         for package in self.priority_packages:
             package.leave_time = self.leave_time
+
+    # Group loaded packages by destination address ID so each stop is a single dict lookup
+    # O(N) once per load
+    def index_packages_by_address(self):
+        self.packages_by_address = {}
+        for package in self.packages + self.priority_packages:
+            self.packages_by_address.setdefault(package.address.ID, []).append(package)